@@ -0,0 +1,133 @@
+'''
+asyncio counterparts of the instrument drivers
+Each call runs the blocking driver method on a small shared thread pool.
+Calls on one resource are serialized by an asyncio lock, so awaiting a
+trace on one analyzer never queues behind another instrument.
+Example usage:
+    esw = AsyncESW(drivers.ESW(connectionId=20))
+    ctrl = AsyncEMCenter(drivers.EMCenter(connectionId=7))
+    await asyncio.gather(esw.connect(), ctrl.connect())
+    trace, position = await asyncio.gather(
+        esw.readTrace(1), ctrl.move(ctrl.tower, 400))
+'''
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import threading
+import time
+import weakref
+
+# Threads blocking on VISA calls at the same time
+maxWorkers = 8
+executor = None
+executorLock = threading.Lock()
+# {event loop: {resource string: asyncio.Lock}}
+resourceLocks = weakref.WeakKeyDictionary()
+
+
+def getExecutor():
+    global executor
+    with executorLock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix='visa')
+        return executor
+
+
+def resourceLock(resourceString):
+    ''' Lock shared by every async instrument on resourceString in the
+        running event loop
+    '''
+    locks = resourceLocks.setdefault(asyncio.get_running_loop(), {})
+    if resourceString not in locks:
+        locks[resourceString] = asyncio.Lock()
+    return locks[resourceString]
+
+
+class AsyncInstrument:
+    def __init__(self, instrument):
+        ''' instrument -> drivers.BaseInstrument doing the blocking I/O '''
+        self.instrument = instrument
+        self.instrument.setResourceString()
+
+    def __str__(self):
+        return f'{self.__class__.__name__} {self.instrument.resourceString}'
+
+    async def run(self, function, *args, **kwargs):
+        ''' Runs function(*args, **kwargs) on the executor once no other call
+            on the same resource is running
+        '''
+        async with resourceLock(self.instrument.resourceString):
+            return await asyncio.get_running_loop().run_in_executor(
+                getExecutor(), partial(function, *args, **kwargs))
+
+    async def call(self, method, *args, **kwargs):
+        return await self.run(getattr(self.instrument, method), *args, **kwargs)
+
+    async def connect(self):
+        await self.call('establishConnection')
+        return await self.identify()
+
+    async def identify(self):
+        return await self.call('__str__')
+
+    async def write(self, command):
+        return await self.call('write', command)
+
+    async def query(self, command):
+        return await self.call('query', command)
+
+
+class AsyncESW(AsyncInstrument):
+    async def readTrace(self, n, delay=None):
+        return await self.call('readTrace', n, delay)
+
+    async def waitSweep(self):
+        return await self.call('waitSweep')
+
+    async def getSweepTime(self):
+        return await self.call('getSweepTime')
+
+    async def applyProfile(self, profile, force=False, verify=False):
+        ''' Applies a profiles.ScanProfile, see ScanProfile.apply '''
+        return await self.run(profile.apply, self.instrument, force, verify)
+
+
+class AsyncEMCenter(AsyncInstrument):
+    @property
+    def tower(self):
+        return self.instrument.tower
+
+    @property
+    def turntable(self):
+        return self.instrument.turntable
+
+    async def getPosition(self, device):
+        return float(await self.call('getCurrentPosition', device))
+
+    async def setPolarity(self, polarity):
+        return await self.call('setPolarity', polarity)
+
+    async def setSpeed(self, device, speed):
+        return await self.call('setSpeed', device, speed)
+
+    async def isOpComplete(self, device):
+        return await self.call('isOpComplete', device) == 1
+
+    async def waitMotion(self, device, target=None):
+        ''' Returns once device stops, other calls run between checks.
+            Checks are spaced like drivers.EMCenter.waitMotion.
+        '''
+        tracker = await self.call('motionTracker', device, target)
+        while not await self.isOpComplete(device):
+            position = await self.getPosition(device)
+            remaining = tracker.remaining(time.monotonic(), position)
+            await asyncio.sleep(self.instrument.nextCheck(remaining))
+        return await self.getPosition(device)
+
+    async def move(self, device, position, wait=True):
+        ''' Seeks device to position, returns the final position when
+            wait is set
+        '''
+        await self.call('setPosition', device, position)
+        if wait:
+            return await self.waitMotion(device)
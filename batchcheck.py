@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+'''
+Headless confidence checks of several ranges on several stations
+A station is a directory laid out like config/, holding the
+<range>Instruments and <range>Factors settings of one chamber. Ranges
+sharing an analyzer run one after another on its own worker, so
+different chambers are checked at the same time. Tower sweeps are never
+run on one controller from two workers at once. Results are stored in
+SQLite files or CSV directories; Excel workbooks are refused.
+Example usage:
+    python batchcheck.py --stations stations.json --user jeremy --report report.csv
+stations.json:
+    [{"name": "Chamber 1", "config": "config"},
+     {"name": "Chamber 2", "config": "config/chamber2", "ranges": ["lf", "L"]}]
+'''
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import dbm
+import json
+import shelve
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import constants
+from ccModel import ConfidenceCheck
+from results import EXCEL_SUFFIXES
+from settings import Instruments
+
+
+class Station:
+    def __init__(self, name, configPath=None, ranges=None):
+        self.name = name
+        self.configPath = Path(constants.CONFIG_FP if configPath is None else configPath)
+        self.ranges = ranges
+
+    def resources(self, fRange):
+        ''' Returns the (analyzer, controller) resource strings of fRange '''
+        instruments = Instruments(fRange, configPath=self.configPath)
+        instruments.sa.setResourceString()
+        instruments.ctrl.setResourceString()
+        return instruments.sa.resourceString, instruments.ctrl.resourceString
+
+    def resultsPath(self):
+        ''' Results file last picked in the settings of this station '''
+        try:
+            with shelve.open(str(self.configPath / 'initial'), flag='r') as d:
+                return d['ccFile']
+        except (KeyError, OSError, dbm.error[0]):
+            return None
+
+
+def loadStations(path):
+    return [Station(s['name'], s.get('config'), s.get('ranges')) for s in json.loads(Path(path).read_text())]
+
+
+class BatchRunner:
+    columns = ['Station', 'Range', 'Analyzer', 'Passed', 'Worst Delta (dB)', 'Duration (s)', 'Error']
+
+    def __init__(self, stations, ranges, user, filepath=None, save=True, polarities=None, azimuths=None):
+        ''' filepath -> results store used by every station instead of
+                        each station's own
+            save -> store the results of passing checks
+            polarities, azimuths -> coverage of the antenna sweep,
+                                    ConfidenceCheck.sweepAntenna's by default
+        '''
+        self.stations = stations
+        self.ranges = ranges
+        self.user = user
+        self.filepath = filepath
+        self.save = save
+        self.polarities = polarities
+        self.azimuths = azimuths
+        self.locks = {}
+        self.locksLock = threading.Lock()
+        # Stations may append their results to one SQLite file or CSV directory
+        self.resultsLock = threading.Lock()
+
+    def lock(self, resource):
+        with self.locksLock:
+            return self.locks.setdefault(resource, threading.Lock())
+
+    def jobs(self):
+        ''' Returns {analyzer resource: [(station, fRange, controller resource)]} '''
+        groups = {}
+        for station in self.stations:
+            for fRange in self.ranges:
+                if station.ranges and fRange not in station.ranges:
+                    continue
+                try:
+                    sa, ctrl = station.resources(fRange)
+                except Exception:
+                    # Reported by check, on a worker of its own
+                    sa, ctrl = (station.name, fRange), None
+                groups.setdefault(sa, []).append((station, fRange, ctrl))
+        return groups
+
+    def check(self, station, fRange, ctrlResource):
+        ''' Runs one range like EasyCC does and returns its report row '''
+        start = time.perf_counter()
+        row = dict.fromkeys(self.columns, '')
+        row.update({'Station': station.name, 'Range': fRange, 'Passed': False, 'Worst Delta (dB)': np.nan})
+        cc = None
+        try:
+            filepath = self.filepath or station.resultsPath()
+            if filepath is None:
+                raise ValueError('No results file selected for this station')
+            if Path(filepath).suffix.lower() in EXCEL_SUFFIXES:
+                # Excel runs through COM, owned by the GUI thread
+                raise ValueError('Excel results files are not supported in batch runs, '
+                    'use a SQLite file or CSV directory')
+            cc = ConfidenceCheck(fRange, filepath, configPath=station.configPath)
+            row['Range'] = cc.fRanges[fRange]
+            cc.instruments.sa.establishConnection()
+            row['Analyzer'] = str(cc.instruments.sa)
+            cc.instruments.setupSaSettings()
+            cc.waitSweep()
+            if fRange in cc.towerMaximum:
+                with self.lock(ctrlResource):
+                    cc.instruments.ctrl.establishConnection()
+                    cc.sweepAntenna(cc.towerMaximum[fRange], self.polarities, self.azimuths)
+            # Raises GoldenValuesMissing before the trace is read
+            golden = cc.getGoldenArrays()[0]
+            cc.findPeaks()
+            results = cc.getResultsFrame()
+            if len(results) < len(golden) or results['Delta'].isna().any():
+                raise ValueError('Golden values without a measured peak')
+            row['Passed'] = cc.checkPass()
+            if row['Passed'] and self.save:
+                with self.resultsLock:
+                    cc.saveResults(self.user)
+            row['Worst Delta (dB)'] = results['Delta'].abs().max()
+        except Exception as e:
+            row['Error'] = f'{e.__class__.__name__}: {e}'
+        finally:
+            if cc is not None:
+                cc.results.close()
+        row['Duration (s)'] = round(time.perf_counter() - start, 1)
+        return row
+
+    def runGroup(self, jobs):
+        return [self.check(*job) for job in jobs]
+
+    def run(self):
+        ''' Checks every station and range, returns the report as a DataFrame '''
+        groups = list(self.jobs().values())
+        rows = []
+        if groups:
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                for groupRows in executor.map(self.runGroup, groups):
+                    rows.extend(groupRows)
+        return pd.DataFrame(rows, columns=self.columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--stations', type=Path, help='JSON list of stations, config/ alone by default')
+    parser.add_argument('--ranges', nargs='+', default=list(ConfidenceCheck.fRanges))
+    parser.add_argument('--user', default=Path.home().name)
+    parser.add_argument('--results', type=Path, help='results store shared by every station')
+    parser.add_argument('--report', type=Path, help='CSV file the report is written to')
+    parser.add_argument('--dry-run', action='store_true', help='do not store results')
+    parser.add_argument('--polarities', help='antenna polarities swept, e.g. VH')
+    parser.add_argument('--azimuths', type=float, nargs='+', help='turntable positions (degrees) covered')
+    args = parser.parse_args()
+
+    stations = loadStations(args.stations) if args.stations else [Station('Default')]
+    report = BatchRunner(stations, args.ranges, args.user, args.results, not args.dry_run,
+        args.polarities, args.azimuths).run()
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(report.to_string(index=False))
+    if args.report:
+        report.to_csv(args.report, index=False)
+    passed = report['Passed'].astype(bool)
+    print(f'{passed.sum()} of {len(report)} checks passed')
+    sys.exit(0 if passed.all() else 1)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+'''
+Benchmarks of the acquisition to verdict path on synthetic traces
+Every case runs against the simulated analyzer on an instant bus, so the
+times are spent in this code rather than on the wire. Each case is timed
+repeat times and the median kept. Results are written as JSON; given a
+baseline from an earlier revision, cases slower than threshold times the
+baseline are reported and the exit status is 1.
+Example usage:
+    python benchmark.py --output bench/HEAD.json
+    python benchmark.py --sizes 30000 --baseline bench/HEAD.json
+'''
+import argparse
+import json
+import os
+import platform
+import shelve
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtWidgets import QApplication, QTableView
+
+import constants
+import drivers
+import simulator
+
+SIZES = (30000, 100000, 1000000)
+
+
+class FixedTraceESW(simulator.SimulatedESW):
+    '''Formats each trace once so reads time the driver, not the simulator'''
+    def getTraceData(self, n):
+        key = (int(n), self.format, self.sweepPoints)
+        cache = self.__dict__.setdefault('responses', {})
+        if key not in cache:
+            cache[key] = super().getTraceData(n)
+        return cache[key]
+
+
+def timeit(function, repeat=5):
+    ''' Returns the median, minimum and number of runs in seconds '''
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'runs': repeat}
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=constants.APP_FP, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def writeFactors(configPath, fRange='lf', rows=1000):
+    ''' Antenna, cable and preamp files covering the range '''
+    frequency = np.linspace(25, 1100, rows)
+    files = {
+        'Antenna': 10 + 8 * np.log10(frequency),
+        'Cable': np.linspace(0.5, 6, rows),
+        'Preamp': -np.full(rows, 30.0),
+    }
+    with shelve.open(str(configPath / f'{fRange}Factors')) as factors:
+        for factor, values in files.items():
+            fp = configPath / f'{factor.lower()}.csv'
+            pd.DataFrame({0: frequency, 1: values}).to_csv(fp, header=False, index=False)
+            factors[factor] = fp
+
+
+class Benchmark:
+    fRange = 'lf'
+
+    def __init__(self, repeat=5):
+        self.repeat = repeat
+        self.results = {}
+        self.app = QApplication.instance() or QApplication([])
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary.name)
+        # Point every config lookup at the scratch directory until close
+        self.configPath = constants.CONFIG_FP
+        constants.CONFIG_FP = self.directory
+        writeFactors(self.directory, self.fRange)
+        self.analyzer = FixedTraceESW(seed=0)
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            devices={'GPIB::20::INSTR': self.analyzer},
+            profiles={'GPIB': simulator.BusProfile()}))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        ''' Restores the config path and VISA backend, removes the scratch
+            directory
+        '''
+        drivers.setBackend(None)
+        constants.CONFIG_FP = self.configPath
+        self.temporary.cleanup()
+
+    def time(self, name, function, repeat=None):
+        self.results[name] = timeit(function, repeat or self.repeat)
+        print(f'{name:<36}{self.results[name]["median"] * 1000:>12.2f} ms')
+
+    def makeCheck(self):
+        from ccModel import ConfidenceCheck
+        resultsPath = self.directory / 'results.db'
+        resultsPath.touch()
+        cc = ConfidenceCheck(fRange=self.fRange, filepath=resultsPath)
+        golden = np.arange(40, 1000, 10, dtype=float)
+        cc.results.setGoldenValues(self.fRange, golden, np.full(golden.size, 40.0))
+        return cc
+
+    def loadDict(self):
+        from factors import CorrectionFactors
+        factors = CorrectionFactors(fRange=self.fRange)
+        def cold():
+            factors.cachePath.unlink()
+            factors.loadDict()
+        self.time('loadDict cold', cold)
+        self.time('loadDict cached', factors.loadDict)
+
+    def readTrace(self, size):
+        sa = drivers.ESW()
+        sa.establishConnection()
+        sa.setSweepPoints(size)
+        sa.readTrace(1)
+        for binary in (False, True):
+            sa.binaryTransfer = binary
+            self.time(f'readTrace {"binary" if binary else "ascii"}/{size}', lambda: sa.readTrace(1))
+        sa.close()
+
+    def confidenceCheck(self, size):
+        cc = self.makeCheck()
+        cc.initAnalyzer()
+        cc.instruments.sa.setSweepPoints(size)
+        cc.readCorrectedTrace(1)
+        self.time(f'readCorrectedTrace/{size}', lambda: cc.readCorrectedTrace(1))
+        self.time(f'findPeaks/{size}', cc.findPeaks)
+        self.time(f'getResultsFrame/{size}', cc.getResultsFrame)
+        return cc.trace
+
+    def dataFrameModel(self, trace):
+        from dfModel import DataFrameModel
+        view = QTableView()
+        view.resize(800, 600)
+        def render():
+            view.setModel(DataFrameModel(trace))
+            view.grab()
+            view.scrollToBottom()
+            view.grab()
+        self.time(f'DataFrameModel/{len(trace)}', render)
+
+    def mplWidget(self, trace):
+        from mplwidget import MplWidget
+        widget = MplWidget(None)
+        widget.resize(1000, 600)
+        x = trace[constants.XCOL].to_numpy()
+        y = trace[constants.CORRECTED].to_numpy()
+        line = widget.graph(x, y, 'trace')
+        widget.canvas.draw()
+        self.time(f'MplWidget draw/{len(trace)}', widget.canvas.draw)
+        widget.updateTrace(line, y)
+        self.time(f'MplWidget updateTrace/{len(trace)}', lambda: widget.updateTrace(line, y))
+
+    def run(self, sizes=SIZES):
+        self.loadDict()
+        for size in sizes:
+            self.readTrace(size)
+            trace = self.confidenceCheck(size)
+            self.dataFrameModel(trace)
+            self.mplWidget(trace)
+        return {
+            'revision': revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'results': self.results,
+        }
+
+
+def compareResults(current, baseline, threshold=1.25):
+    ''' Returns (case, baseline median, current median, ratio) for every
+        case at least threshold times slower than in baseline
+    '''
+    regressions = []
+    for case, result in current['results'].items():
+        previous = baseline['results'].get(case)
+        if previous and previous['median'] > 0:
+            ratio = result['median'] / previous['median']
+            if ratio >= threshold:
+                regressions.append((case, previous['median'], result['median'], ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=Path, default=Path('benchmark.json'))
+    parser.add_argument('--baseline', type=Path)
+    parser.add_argument('--threshold', type=float, default=1.25,
+        help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    with Benchmark(args.repeat) as benchmark:
+        report = benchmark.run(args.sizes)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compareResults(report, baseline, args.threshold)
+        for case, before, after, ratio in regressions:
+            print(f'REGRESSION {case}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms ({ratio:.2f}x)')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {baseline.get("revision") or args.baseline}')
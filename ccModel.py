@@ -1,5 +1,4 @@
 from pathlib import Path
-import xlwings as xw
 import pandas as pd
 import numpy as np
 import sys
@@ -8,6 +7,10 @@ import time
 import constants
 import warnings
 from factors import CorrectionFactors
+from motionplan import MotionPlanner, currentState, runPlan
+from peaks import findWindowPeaks
+from recorder import SessionRecorder, pruneSessions
+from results import canCreate, openResults
 from settings import Instruments
 
 class ConfidenceCheck:
@@ -15,20 +18,36 @@ class ConfidenceCheck:
     ycol = constants.YCOL
     xcol = constants.XCOL
     resultsSuffix = ' Results'
-
-    def __init__(self, fRange='lf', filepath=Path('G:\Shared drives\Facebook EMI Lab\Test Data\Daily Confidence Checks.xlsx')):
+    # Golden frequencies match the highest peak within this many MHz, about
+    # two RBWs on CE so neighbouring comb harmonics are not picked up
+    peakWindow = {'lf': 0.5, 'mf': 0.5, 'hf': 0.5, 'L': 0.02, 'N': 0.02, 'S': 0.02}
+    # Coverage of sweepAntenna, golden values were taken in V alone
+    sweepPolarities = 'V'
+    sweepAzimuths = ()
+    # Frames a new session file has room for before it grows
+    recordCapacity = 64
+    # Highest tower position (cm) swept for each radiated emissions range
+    towerMaximum = {'lf': 400, 'mf': 300, 'hf': 300}
+    fRanges = {
+        'lf': 'RE 30MHz - 1GHz',
+        'mf': 'RE 1GHz - 18GHz',
+        'hf': 'RE 18GHz - 40GHz',
+        'L': 'CE 150kHz - 30MHz Line',
+        'N': 'CE 150kHz - 30MHz Neutral',
+        'S': 'CE 150kHz - 30MHz Signal',
+    }
+
+    def __init__(self, fRange='lf', filepath=Path('G:\Shared drives\Facebook EMI Lab\Test Data\Daily Confidence Checks.xlsx'), configPath=None):
+        # Settings and factors of one station, constants.CONFIG_FP by default
+        self.configPath = constants.CONFIG_FP if configPath is None else Path(configPath)
         self.filepath = filepath
         self._goldenValues = pd.DataFrame()
         self.trace = pd.DataFrame()
-        self.fRanges = {
-            'lf': 'RE 30MHz - 1GHz',
-            'mf': 'RE 1GHz - 18GHz',
-            'hf': 'RE 18GHz - 40GHz',
-            'L': 'CE 150kHz - 30MHz Line',
-            'N': 'CE 150kHz - 30MHz Neutral',
-            'S': 'CE 150kHz - 30MHz Signal',
-        }
         self.fRange = fRange
+        self.recordPath = None
+        self.recorder = None
+        # Last known positions, stored with recorded frames
+        self.positions = {'tower': np.nan, 'turntable': np.nan}
         
     @property
     def filepath(self):
@@ -36,17 +55,23 @@ class ConfidenceCheck:
 
     @filepath.setter
     def filepath(self, fp):
-        if Path(fp).exists():
+        # Only the settings dialog stores the selection for the next start
+        if Path(fp).exists() or canCreate(fp):
             self._filepath = fp
-            with shelve.open(str(constants.CONFIG_FP / 'initial')) as d:
-                d['ccFile'] = Path(fp)
         else:
-            with shelve.open(str(constants.CONFIG_FP / 'initial')) as d:
-                self._filepath = d['ccFile']
+            self._filepath = self.savedFilepath()
             warnings.warn('Invalid file selection, switching to default')
 
-        self.app = xw.App(visible=True)
-        self.wb = xw.Book(str(self.filepath))
+        # Excel workbook, SQLite database or CSV directory, opened on first use
+        if 'results' in self.__dict__:
+            self.results.close()
+        self.results = openResults(self.filepath, self.fRanges)
+        self._golden = {}
+
+    def savedFilepath(self):
+        # Results file last picked in the settings dialog
+        with shelve.open(str(self.configPath / 'initial'), flag='r') as d:
+            return d['ccFile']
 
     @property
     def fRange(self):
@@ -56,32 +81,43 @@ class ConfidenceCheck:
     def fRange(self, val):
         if val in self.fRanges:
             self._fRange = val
-            self.ws = self.wb.sheets[self.fRanges[val]]
-            self.measuredTable = f'Measured_{val}'
-            self.deltaTable = f'Deltas_{val}'
-            self.measCol = self.ws.range(f'{self.measuredTable}')[:,3]
-            self.deltaCol = self.ws.range(f'{self.deltaTable}')[:,0]
-            self.instruments = Instruments(val)
-            self.factors = CorrectionFactors(fRange=val)
+            self.instruments = Instruments(val, configPath=self.configPath)
+            self.factors = CorrectionFactors(configPath=self.configPath, fRange=val)
         else:
             warnings.warn('Invalid range selection')
 
     @property
     def goldenValues(self):
-        frequencies = self.ws.range(f'{self.measuredTable}')[:,0]
-        values = self.ws.range(f'{self.measuredTable}')[:,1]
+        frequencies, values = self.getGoldenArrays()
         self._goldenValues = pd.DataFrame(data={
-            self.xcol: frequencies.value,
-            self.corrected: values.value,
+            self.xcol: frequencies,
+            self.corrected: values,
         })
         return self._goldenValues
 
+    def getGoldenArrays(self, reload=False):
+        ''' Returns read-only (frequencies, values) arrays for the current
+            range. They are read from the results store once and again only
+            after reloadGoldenValues() or when the store changes on disk.
+        '''
+        mtime = self.results.changedTime(self.fRange)
+        cached = self._golden.get(self.fRange)
+        if reload or cached is None or cached[0] != mtime:
+            frequencies, values = self.results.goldenValues(self.fRange)
+            frequencies.flags.writeable = False
+            values.flags.writeable = False
+            cached = self._golden[self.fRange] = (mtime, frequencies, values)
+        return cached[1], cached[2]
+
+    def reloadGoldenValues(self):
+        # Forget golden values of every range
+        self._golden.clear()
+
     def initAnalyzer(self):
         try:
             self.instruments.sa.establishConnection()
             instId = str(self.instruments.sa)
             self.instruments.setupSaSettings()
-            self.instruments.sa.resource.close()
             return instId
         except:
             return 'Analyzer communication unsuccessful. Verify connection settings'
@@ -90,111 +126,127 @@ class ConfidenceCheck:
         try:
             self.instruments.ctrl.establishConnection()
             instId = str(self.instruments.ctrl)
-            self.instruments.ctrl.resource.close()
             return instId
         except:
             return 'Controller communication unsuccessful. Verify connection settings'
 
-    def readCorrectedTrace(self, num_trace=1, delay=0):
-        self.instruments.sa.open()
-        self.trace = self.instruments.sa.readTrace(num_trace, delay)
-
-        # Merge correction factors
-        self.trace = pd.merge_asof(self.trace, 
-            self.factors.cf, 
-            on=self.xcol, 
-            direction='nearest', 
-            tolerance=2)
-
-        # Merge upper and lower correction factor bounds
-        lastFreq = self.trace[self.xcol].iloc[-1]
-        firstFreq = self.trace[self.xcol].iloc[0]
-
-        cfFreqs = list(self.factors.cf[self.xcol].values)
-        for freq in cfFreqs:
-            if firstFreq > freq:
-                first_cf = freq
-            elif firstFreq < freq:
-                break
-        for freq in cfFreqs:
-            if lastFreq < freq:
-                last_cf = freq
-                break
-
-        # Interpolate factors
-        columns = self.trace.columns.tolist()
-        columns.remove(self.xcol)
-        columns.remove(self.ycol)
-
-        for col in columns:
-            first = self.trace[col].first_valid_index()
-            last = self.trace[col].last_valid_index()
-            self.trace.loc[first:last, col] =self.trace.loc[first:last, col].interpolate(method='index')
+    def waitSweep(self):
+        # Block until the analyzer completes a sweep not read yet
+        return self.instruments.sa.waitSweep()
 
-        self.trace[self.corrected] = self.trace[self.ycol] + self.trace['Total Correction Factor']
-        self.instruments.sa.close()
+    def readCorrectedTrace(self, num_trace=1, delay=0):
+        # The pooled session stays open between frames
+        trace = self.instruments.sa.readTrace(num_trace, delay)
+        return self.correctTrace(trace)
+
+    def correctTrace(self, trace):
+        # Add the correction vector compiled for this sweep grid
+        frequency = trace[self.xcol].to_numpy()
+        correction = self.factors.getCorrection(frequency)
+        self.trace = pd.DataFrame(data={
+            self.xcol: frequency,
+            self.ycol: trace[self.ycol].to_numpy(),
+            self.factors.total: correction,
+            self.corrected: trace[self.ycol].to_numpy() + correction,
+        })
         return self.trace
 
-    def sweepAntenna(self, maximum):
-        # Sweep antenna mast from 100 - maximum
-        self.instruments.ctrl.open()
-        self.instruments.ctrl.setPolarity('V')
-        self.instruments.ctrl.setSpeed(self.instruments.ctrl, 3)
-        self.instruments.ctrl.setPosition(self.instruments.ctrl.tower, 100)
-        self.syncTower()
-        self.instruments.ctrl.setPosition(self.instruments.ctrl.tower, maximum)
-        self.syncTower()
-        self.instruments.ctrl.setPosition(self.instruments.ctrl.tower, 100)
-        self.syncTower()
-        self.instruments.ctrl.close()
+    def startRecording(self, directory, keep=None, maxBytes=None):
+        ''' Records every frame passed to recordFrame to a new session
+            file in directory, created with the first frame. Older sessions
+            beyond keep sessions or maxBytes in total are deleted first.
+        '''
+        self.stopRecording()
+        if Path(directory).is_dir():
+            pruneSessions(directory, keep, maxBytes)
+        name = f'{self.fRange}_{time.strftime("%Y%m%d_%H%M%S")}'
+        self.recordPath = Path(directory) / name
+
+    def recordFrame(self, *traces):
+        # Raw amplitudes only, corrections can be applied again on replay
+        if self.recordPath is None:
+            return
+        if self.recorder is None:
+            self.recorder = SessionRecorder(
+                self.recordPath,
+                traces[0][self.xcol].to_numpy(),
+                traces=len(traces),
+                capacity=self.recordCapacity,
+                fRange=self.fRange)
+        self.recorder.record(
+            *(trace[self.ycol].to_numpy() for trace in traces),
+            tower=self.positions['tower'],
+            turntable=self.positions['turntable'])
+
+    def stopRecording(self):
+        ''' Closes the session file, returns its path or None '''
+        path = None
+        if self.recorder is not None:
+            self.recorder.close()
+            path = self.recorder.path
+        self.recorder = None
+        self.recordPath = None
+        return path
+
+    def updatePosition(self, name):
+        device = getattr(self.instruments.ctrl, name)
+        self.positions[name] = float(self.instruments.ctrl.getCurrentPosition(device))
+
+    def sweepAntenna(self, maximum, polarities=None, azimuths=None):
+        # Sweep antenna mast over 100 - maximum in each polarity, planned,
+        # and bring it back down to 100
+        self.instruments.ctrl.setSpeed(self.instruments.ctrl.tower, 3)
+        return self.sweepCoverage(
+            (100, maximum),
+            self.sweepPolarities if polarities is None else polarities,
+            self.sweepAzimuths if azimuths is None else azimuths,
+            returnTower=100)
+
+    def sweepCoverage(self, heights, polarities='VH', azimuths=(), grid=False, returnTower=None):
+        # Cover heights and azimuths in each polarity in the fastest order,
+        # ending with the tower at returnTower if given
+        ctrl = self.instruments.ctrl
+        names = {ctrl.tower: 'tower', ctrl.turntable: 'turntable'}
+        def progress(device, position):
+            self.positions[names[device]] = position
+        start = currentState(ctrl)
+        self.positions.update(tower=start['tower'], turntable=start['turntable'])
+        plan = MotionPlanner.fromController(ctrl).plan(start, heights, polarities, azimuths, grid, returnTower)
+        runPlan(ctrl, plan, progress)
+        return plan
 
     def syncTower(self):
-        # Wait for tower movement to complete
-        while not self.instruments.ctrl.isOpComplete(self.instruments.ctrl.tower):
-            time.sleep(0.5)
+        # Wait for tower movement to complete, positions kept for recording
+        def progress(position):
+            self.positions['tower'] = position
+        self.instruments.ctrl.waitMotion(self.instruments.ctrl.tower, progress=progress)
 
     def findPeaks(self):
-        # Empty peaks dataframe
-        self.peaks = pd.DataFrame(columns=[self.xcol, self.corrected])
         traceMax = self.readCorrectedTrace(1)
 
-        # Lookup closest frequency/amplitude to frequency list
-        for freq in self.goldenValues[self.xcol]:
-            peak = traceMax[[self.xcol, self.corrected]].iloc[
-                (traceMax[self.xcol]-freq).abs().argsort()[:1]]
-            self.peaks = self.peaks.append(peak)
+        # Highest corrected amplitude within peakWindow of each golden frequency
+        index = findWindowPeaks(
+            traceMax[self.xcol].to_numpy(),
+            traceMax[self.corrected].to_numpy(),
+            self.getGoldenArrays()[0],
+            self.peakWindow[self.fRange])
+        self.peaks = traceMax[[self.xcol, self.corrected]].iloc[index]
 
         return self.peaks
 
-    def insertDataToExcel(self, user):
-        # Insert empty column values to table
-        # Store equations
-        average = self.ws.range(f'{self.measuredTable}[Average]')
-        averageFormula = average.formula
-        deltaFormula = self.deltaCol.formula
-
-        # Insert empty columns
-        if sys.platform == 'win32' or 'win64':
-            self.ws.api.ListObjects(f'{self.measuredTable}').ListColumns.add(4)
-            self.ws.api.ListObjects(f'{self.deltaTable}').ListColumns.add(1)
-        else:
-            self.measCol.api.insert_into_range()
-            self.deltaCol.api.insert_into_range()
-
-        # Repopulate columns with stored equations
-        average.value = averageFormula
-        self.ws.range(f'{self.deltaTable}')[:,0].value = deltaFormula
-
-        # Enter user and date 
-        date = time.strftime('%x', time.localtime())
-        self.ws.range('D9').value = f'{user} - {date}'
-
-        # Reshape array to column vector and update the excel sheet
-        self.measCol.value = self.peaks[self.corrected].values.reshape(-1,1)
+    def saveResults(self, user):
+        # Store the measured peaks of the current results frame and save
+        self.results.saveResults(
+            self.fRange,
+            user,
+            self.resultData[self.xcol].to_numpy(),
+            self.resultData[self.corrected].to_numpy(),
+            self.resultData[self.corrected + self.resultsSuffix].to_numpy(),
+            self.resultData['Delta'].to_numpy())
+        self.results.save()
 
     def clearResults(self):
-        # Clear the measurements column
-        self.measCol.clear_contents()
+        self.results.clearResults(self.fRange)
 
     def checkPass(self):
         # Check the delta column is not more than +/- 3dB
@@ -217,15 +269,20 @@ class ConfidenceCheck:
         self.resultData['Delta'] = (self.resultData[self.corrected + self.resultsSuffix] - self.resultData[self.corrected])
         return self.resultData
 
+    def disconnect(self):
+        # End the pooled instrument sessions
+        self.instruments.sa.disconnect()
+        self.instruments.ctrl.disconnect()
+
     def save_and_exit(self):
-        self.wb.save(self.filepath)
-        self.wb.close()
-        self.app.quit()
+        self.results.save()
+        self.results.close()
+        self.disconnect()
         sys.exit(0)
 
     def exit(self):
-        self.wb.close()
-        self.app.quit()
+        self.results.close()
+        self.disconnect()
         sys.exit(0)
 
 if __name__ == "__main__":
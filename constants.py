@@ -2,6 +2,10 @@ from pathlib import Path
 
 APP_FP = Path(__file__).parent.absolute()
 CONFIG_FP = APP_FP / 'config'
+SESSIONS_FP = APP_FP / 'sessions'
+# Recorded sessions kept in SESSIONS_FP, oldest are deleted first
+MAX_SESSIONS = 20
+MAX_SESSIONS_BYTES = 2 * 1024 ** 3
 CORRECTED = 'Corrected Amp. (dBuV/m)'
 YCOL = 'Amplitude (dBuV/m)'
 XCOL = 'Frequency (MHz)'
\ No newline at end of file
@@ -1,25 +1,87 @@
-from PyQt5.QtCore import QAbstractTableModel, Qt
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
 from PyQt5 import QtGui
+import numpy as np
 import pandas as pd
 
 class DataFrameModel(QAbstractTableModel):
+    ''' Read only table of a DataFrame. Columns are kept as NumPy arrays and
+        display strings are formatted a block of rows at a time when first
+        shown. Rows are handed to the view in batches of fetchSize.
+    '''
+    fetchSize = 1000
+    blockSize = 256
+
     def __init__(self, data):
         QAbstractTableModel.__init__(self)
         self._data = data
+        self._columns = [data.iloc[:, col].to_numpy() for col in range(data.shape[1])]
+        self._headers = [str(name) for name in data.columns]
+        self._strings = [np.empty(len(data), dtype=object) for col in self._columns]
+        self._formatted = [np.zeros(-(-len(data) // self.blockSize), dtype=bool) for col in self._columns]
+        self._order = None
+        self._loaded = min(len(data), self.fetchSize)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._data)
 
-    def rowCount(self, parent=None):
-        return self._data.shape[0]
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.fetchSize, len(self._data) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
 
-    def columnCount(self, parent=None):
-        return self._data.shape[1]
+    def sourceRow(self, row):
+        return row if self._order is None else self._order[row]
+
+    def displayText(self, row, col):
+        ''' Formats the block holding row of col on first use '''
+        block = row // self.blockSize
+        if not self._formatted[col][block]:
+            rows = slice(block * self.blockSize, (block + 1) * self.blockSize)
+            self._strings[col][rows] = self._columns[col][rows].astype(str)
+            self._formatted[col][block] = True
+        return self._strings[col][row]
 
     def data(self, index, role=Qt.DisplayRole):
         if index.isValid():
             if role == Qt.DisplayRole:
-                return str(self._data.iloc[index.row(), index.column()])
+                return self.displayText(self.sourceRow(index.row()), index.column())
         return None
 
     def headerData(self, col, orientation, role):
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
-            return self._data.columns[col]
-        return None
\ No newline at end of file
+            return self._headers[col]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        ''' Sorts by column with a stable NumPy argsort, NaN last when
+            ascending.
+            A negative column restores the original order.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            self._order = None
+        else:
+            values = self._columns[column]
+            try:
+                key = np.argsort(values, kind='stable')
+            except TypeError:
+                key = np.argsort(values.astype(str), kind='stable')
+            if order == Qt.DescendingOrder:
+                key = key[::-1]
+            self._order = key
+        self.layoutChanged.emit()
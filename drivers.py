@@ -6,50 +6,277 @@ Author: Jeremy
 import visa
 import pandas as pd
 import numpy as np
+import threading
 import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from instrumentation import CommandStats, InstrumentedResource
+from sessionpool import SessionPool
+
+# Resource manager used instead of a VISA library when set, see setBackend
+backend = None
+# VISA resource manager shared by every connection, created on first use
+resourceManager = None
+# Sessions stay open here between frames, see BaseInstrument.establishConnection
+pool = SessionPool()
+
+def setBackend(resourceManager):
+    ''' Routes new connections through resourceManager, e.g.
+        simulator.SimulatedResourceManager(). None restores VISA.
+        Sessions opened on the previous backend are closed.
+    '''
+    global backend
+    backend = resourceManager
+    pool.close()
+
+# Statistics every new connection records into when set, see setCommandStats
+commandStats = None
+
+def setCommandStats(stats):
+    ''' Times every command sent on connections opened afterwards, e.g.
+        setCommandStats(instrumentation.CommandStats()). None turns it off.
+    '''
+    global commandStats
+    commandStats = stats
+
+def getResourceManager():
+    global resourceManager
+    if backend is not None:
+        return backend
+    if resourceManager is None:
+        resourceManager = visa.ResourceManager()
+    return resourceManager
+
+UNITS = {'HZ': 1, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+
+def toHz(value, units):
+    return float(value) * UNITS[units.upper()]
+
+# Boolean settings read back as 1 and 0
+BOOLEANS = {'ON': 1.0, 'OFF': 0.0}
+
+def settingValue(value):
+    ''' Normal form of a setting: a float for numbers and ON/OFF, an upper
+        case string otherwise
+    '''
+    if isinstance(value, str):
+        value = value.strip().strip('"').upper()
+        if value in BOOLEANS:
+            return BOOLEANS[value]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def settingMatches(expected, actual):
+    ''' Compares a setting with a read back or mirrored value. Strings
+        match on their short form, e.g. MAXH and MAXHOLD; numbers in any
+        format and ON/OFF against 1/0.
+    '''
+    if actual is None:
+        return False
+    expected, actual = settingValue(expected), settingValue(actual)
+    if isinstance(expected, float) and isinstance(actual, float):
+        return abs(actual - expected) <= 1e-9 * max(abs(expected), 1)
+    if isinstance(expected, str) and isinstance(actual, str):
+        return actual.startswith(expected) or expected.startswith(actual)
+    return False
 
 class BaseInstrument:
     '''Common SCPI commands'''
+    # Longest message sent while batching, in characters
+    maxBatchLength = 1000
+
     def __init__(self, connectionType='GPIB', connectionId=20, log=False, *args, **kwargs):
-        '''Initialize resource object'''
+        ''' Initialize resource object
+            log -> time every command of this instrument, see getCommandStats
+        '''
         self.connectionType = connectionType.upper()
         self.connectionId = connectionId
         self.log = log
 
     def establishConnection(self):
-        self.rm = visa.ResourceManager()
+        ''' Takes the pooled session of the resource, opening it only when
+            it is not open yet or has gone stale. The settings mirror is the
+            session's, so it is kept unless the session was reopened.
+        '''
+        self.rm = getResourceManager()
         self.setResourceString()
-        self.resource = self.rm.open_resource(self.resourceString)
+        self.resource = pool.acquire(self.rm, self.resourceString)
+        self._state = self.resource.state
+        stats = self.getCommandStats()
+        if stats is not None:
+            self.resource = InstrumentedResource(self.resource, stats, self.resourceString)
         self.resource.timeout = 35000
 
+    def getCommandStats(self):
+        ''' Returns the statistics this instrument's commands are recorded
+            into: the module's (setCommandStats), its own when created with
+            log=True, or None
+        '''
+        if commandStats is not None:
+            return commandStats
+        if self.__dict__.get('log'):
+            if '_stats' not in self.__dict__:
+                self._stats = CommandStats()
+            return self._stats
+        return None
+
+    def __getstate__(self):
+        # Sessions belong to the pool, settings are pickled without them
+        state = self.__dict__.copy()
+        for key in ('rm', 'resource', '_batch', '_state'):
+            state.pop(key, None)
+        return state
+
     def setResourceString(self):
         self.resourceString = f'{self.connectionType}::{self.connectionId}::INSTR'
 
+    @property
+    def state(self):
+        '''Client side mirror of instrument settings, keyed by SCPI header.
+           Filled in by setters and queries, emptied on preset and when the
+           pooled session is reopened.
+        '''
+        if '_state' not in self.__dict__:
+            self._state = {}
+        return self._state
+
+    def invalidate(self, *keys):
+        ''' Forgets the mirrored values of keys, or every value if none given.
+            Call after changing settings from the instrument front panel.
+        '''
+        if keys:
+            for key in keys:
+                self.state.pop(key, None)
+        else:
+            self.state.clear()
+
+    @property
+    def batching(self):
+        return self.__dict__.get('_batch') is not None
+
+    def write(self, command):
+        ''' Sends command, or queues it while batching. Queries are never
+            queued, they flush the queue first.
+        '''
+        if self.batching and '?' not in command:
+            self._batch.append(command)
+            return len(command)
+        self.flush()
+        return self.resource.write(command)
+
+    def query(self, command):
+        self.flush()
+        return self.resource.query(command)
+
+    def flush(self, sync=False):
+        ''' Sends queued commands joined by semicolons, in messages of up
+            to maxBatchLength characters. With sync the last message ends
+            with *OPC? and its answer is returned.
+        '''
+        queued = self.__dict__.get('_batch') or []
+        messages = []
+        for command in queued:
+            if not (command.startswith('*') or command.startswith(':')):
+                command = ':' + command
+            if messages and len(messages[-1]) + len(command) < self.maxBatchLength:
+                messages[-1] += ';' + command
+            else:
+                messages.append(command)
+        queued.clear()
+        if sync:
+            last = messages.pop() + ';*OPC?' if messages else '*OPC?'
+        for message in messages:
+            self.resource.write(message)
+        if sync:
+            return int(self.resource.query(last))
+
+    @contextmanager
+    def batch(self, verify=False):
+        ''' Queues writes made inside the block and sends them as a few
+            semicolon joined messages synchronized by a single *OPC? on exit.
+            With verify every mirrored setting is read back afterwards.
+            Example usage:
+                with esw.batch():
+                    esw.setFrequencyStart(30, 'MHz')
+                    esw.setFrequencyStop(1, 'GHz')
+        '''
+        if self.batching:
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+            self.flush(sync=True)
+        except BaseException:
+            # Queued settings may not have reached the instrument
+            self.invalidate()
+            raise
+        finally:
+            self._batch = None
+        if verify:
+            mismatches = self.verifySettings()
+            if mismatches:
+                warnings.warn(f'Settings not applied: {mismatches}')
+
+    def verifySettings(self, keys=None):
+        ''' Reads back mirrored settings, returns {key: (expected, actual)}
+            for each one that differs and forgets it
+        '''
+        mismatches = {}
+        for key in list(keys or self.state):
+            expected = self.state.get(key)
+            if key in ('*IDN', 'axis') or expected is None:
+                continue
+            actual = self.query(f'{key}?')
+            if not settingMatches(expected, actual):
+                mismatches[key] = (expected, actual)
+                self.invalidate(key)
+        return mismatches
+
+    def cachedQuery(self, key, command, convert=str):
+        ''' Returns the mirrored value of key, querying the instrument once '''
+        if key not in self.state:
+            self.state[key] = convert(self.query(command))
+        return self.state[key]
+
+    def getSetting(self, key, convert=str):
+        ''' Returns a mirrored setting, reading it back with "<key>?" on a miss '''
+        return self.cachedQuery(key, f'{key}?', convert)
+
     def __repr__(self):
         '''Returns instrument ID'''
-        return self.resource.query('*IDN?')
+        return self.cachedQuery('*IDN', '*IDN?')
 
     def __str__(self):
         '''Returns instrument ID'''
         try:
-            return self.resource.query('*IDN?')
+            return self.cachedQuery('*IDN', '*IDN?')
         except:
             self.setResourceString()
             return f'{self.__class__.__name__} {self.resourceString}'
 
     def reset(self):
         '''Resets instrument'''
-        self.resource.write('*RST')
+        self.write('*RST')
+        self.invalidate()
 
     def wait(self):
         '''Wait for instrument to complete operation'''
-        return self.resource.write('*WAI')
+        return self.write('*WAI')
 
     def isOpComplete(self):
-        '''Returns 1 when command is completed, 0 otherwise'''
-        return int(self.resource.query('*OPC?'))
+        '''Returns 1 when command is completed, 0 otherwise.
+           Deferred to the end of the batch while batching.
+        '''
+        if self.batching:
+            return 1
+        return int(self.query('*OPC?'))
 
     def close(self):
+        ''' Pooled sessions stay open, see disconnect '''
         try:
             self.resource.close()
         except:
@@ -60,27 +287,41 @@ class BaseInstrument:
             self.resource.open()
         except:
             pass
+
+    def disconnect(self):
+        '''Ends the pooled session of this instrument's resource'''
+        self.setResourceString()
+        pool.close(self.resourceString)
         
 
     
 class ESW(BaseInstrument):
+    # Transfer traces as REAL,32 blocks on every bus, False reads GPIB in ASCII
+    binaryTransfer = True
+    # Sweep time multiplier allowing for retrace between sweeps
+    sweepMargin = 1.05
+
     def __init__(self, *args, **kwargs):
         return super().__init__(*args, **kwargs)
 
     def preset(self):
         '''Preset selection button'''
-        self.resource.write('SYST:PRES')
+        self.write('SYST:PRES')
+        self.invalidate()
+        self.sweepRestarted()
         self.displayOn()
         return self.isOpComplete()
 
     def displayOn(self):
-        self.resource.write('SYST:DISP:UPD ON')
+        self.write('SYST:DISP:UPD ON')
 
     def instrumentMode(self, mode):
         '''Modes: SAN -> Spectrum Analyzer
                   REC -> EMI Test Receiver
         '''
-        self.resource.write(f'INST:SEL {mode}')
+        self.write(f'INST:SEL {mode}')
+        self.invalidate()
+        self.state['INST'] = mode.upper()
         return self.isOpComplete()
 
     def setSweepMode(self, n, mode):
@@ -91,7 +332,9 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.sweep(2, 'off')  # Sets single sweep mode
         '''
-        self.resource.write(f'INIT{n}:CONT {mode.upper()}')
+        self.write(f'INIT{n}:CONT {mode.upper()}')
+        self.state[f'INIT{n}:CONT'] = mode.upper()
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def setSweepCount(self, count):
@@ -101,24 +344,27 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setSweepCount(20)
         '''
-        self.resource.write(f'SWE:COUN {count}')
+        self.write(f'SWE:COUN {count}')
+        if self.batching:
+            self.state['SWE:COUN'] = count
+            return True
         if self.getSweepCount() == count:
-            if self.log:
-                print(f'Sweep count: {count}')
+            self.state['SWE:COUN'] = count
             return True
         else:
-            if self.log:
-                print(f'Error: Sweep count not set to {count}')
+            warnings.warn(f'Sweep count not set to {count}')
             return False
 
     def getSweepCount(self):
-        return int(self.resource.query('SWE:COUN?'))
+        return int(self.query('SWE:COUN?'))
 
     def setSweepPoints(self, points):
-        self.resource.write(f'SWE:POIN {points}')
+        self.write(f'SWE:POIN {points}')
+        self.state['SWE:POIN'] = int(points)
+        self.sweepRestarted()
 
     def getSweepPoints(self):
-        return self.resource.query('SWE:POIN?')
+        return self.cachedQuery('SWE:POIN', 'SWE:POIN?', int)
 
     def setRbw(self, rbw, units):
         ''' Options: rbw -> numerical value to set resolution bandwidth
@@ -128,7 +374,9 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setRbw(1, 'MHz')  # Sets RBW to 1MHz
         '''
-        self.resource.write(f'BAND {rbw}{units.upper()}')
+        self.write(f'BAND {rbw}{units.upper()}')
+        self.state['BAND'] = toHz(rbw, units)
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def setVbw(self, vbw, units):
@@ -139,7 +387,9 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setVbw(1, 'MHz')  # Sets VBW to 1MHz
         '''
-        self.resource.write(f'BAND:VID {vbw}{units.upper()}')
+        self.write(f'BAND:VID {vbw}{units.upper()}')
+        self.state['BAND:VID'] = toHz(vbw, units)
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def setFrequencyCenter(self, frequency, units):
@@ -150,7 +400,10 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setFrequencyCenter(1, 'MHz')
         '''
-        self.resource.write(f'SENS:FREQ:CENT {frequency}{units.upper()}')
+        self.write(f'SENS:FREQ:CENT {frequency}{units.upper()}')
+        self.invalidate('SENS:FREQ:STAR', 'SENS:FREQ:STOP')
+        self.state['SENS:FREQ:CENT'] = toHz(frequency, units)
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def setFrequencyStart(self, frequency, units):
@@ -161,7 +414,10 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setFrequencyStart(1, 'MHz')
         '''
-        self.resource.write(f'SENS:FREQ:STAR {frequency}{units.upper()}')
+        self.write(f'SENS:FREQ:STAR {frequency}{units.upper()}')
+        self.invalidate('SENS:FREQ:CENT')
+        self.state['SENS:FREQ:STAR'] = toHz(frequency, units)
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def setFrequencyStop(self, frequency, units):
@@ -172,7 +428,10 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.setFrequencyStop(1, 'MHz')
         '''
-        self.resource.write(f'SENS:FREQ:STOP {frequency}{units.upper()}')
+        self.write(f'SENS:FREQ:STOP {frequency}{units.upper()}')
+        self.invalidate('SENS:FREQ:CENT')
+        self.state['SENS:FREQ:STOP'] = toHz(frequency, units)
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def getFrequencyCenter(self):
@@ -181,13 +440,25 @@ class ESW(BaseInstrument):
                 esw = ESW()
                 esw.getFrequencyCenter()
         '''
-        return self.resource.query('SENS:FREQ:CENT?')
+        return self.query('SENS:FREQ:CENT?')
 
     def getFrequencyStart(self):
-        return int(self.resource.query('SENS:FREQ:START?')) / 1000000
+        return self.cachedQuery('SENS:FREQ:STAR', 'SENS:FREQ:START?', int) / 1000000
 
     def getFrequencyStop(self):
-        return int(self.resource.query('SENS:FREQ:STOP?')) / 1000000
+        return self.cachedQuery('SENS:FREQ:STOP', 'SENS:FREQ:STOP?', int) / 1000000
+
+    def getFrequencyAxis(self):
+        ''' Returns the sweep frequencies (MHz), rebuilt only when the
+            start, stop or number of points change
+        '''
+        key = (self.getFrequencyStart(), self.getFrequencyStop(), self.getSweepPoints())
+        cached = self.state.get('axis')
+        if cached is None or cached[0] != key:
+            frequency = np.linspace(*key)
+            frequency.flags.writeable = False
+            cached = self.state['axis'] = (key, frequency)
+        return cached[1]
 
     def setTraceMode(self, trace, mode):
         ''' Options: trace -> int value 1-6
@@ -203,13 +474,15 @@ class ESW(BaseInstrument):
                 # Set Trace 1 to Max Hold
                 esw.setTraceMode(1, 'MAXH')
         '''
-        self.resource.write(f'DISP:TRAC{trace}:MODE {mode}'.upper())
+        self.write(f'DISP:TRAC{trace}:MODE {mode}'.upper())
+        self.state[f'DISP:TRAC{trace}:MODE'] = mode.upper()
+        self.sweepRestarted()
         return self.isOpComplete()
 
     def getTraceMode(self, trace):
         ''' Returns specified trace (1-6) mode
         '''
-        return self.resource.query(f'DISP:TRAC{trace}:MODE?')
+        return self.cachedQuery(f'DISP:TRAC{trace}:MODE', f'DISP:TRAC{trace}:MODE?')
 
     def setDetector(self, trace, mode):
         ''' Options: trace -> int value 1-6
@@ -225,16 +498,50 @@ class ESW(BaseInstrument):
                 # Set Trace 1 detector to average
                 esw.setDetector(1, 'AVER')
         '''
-        self.resource.write(f'DET{trace} {mode}'.upper())
+        self.write(f'DET{trace} {mode}'.upper())
+        self.state[f'DET{trace}'] = mode.upper()
         return self.isOpComplete()
 
     def getDetector(self, trace):
         ''' Returns specified trace (1-6) detector
         '''
-        return self.resource.query(f'DET{trace}?')
+        return self.cachedQuery(f'DET{trace}', f'DET{trace}?')
+
+    def getSweepTime(self):
+        ''' Returns the analyzer's sweep time in seconds '''
+        return self.cachedQuery('SWE:TIME', 'SWE:TIME?', float)
+
+    def sweepRestarted(self):
+        # Settings changed, the sweep time may differ and a new sweep begins
+        self.invalidate('SWE:TIME')
+        self._lastSweep = time.monotonic()
+
+    def isContinuous(self):
+        return all(not settingMatches('OFF', mode) for key, mode in self.state.items()
+            if key.startswith('INIT') and key.endswith(':CONT'))
+
+    def waitSweep(self):
+        ''' Blocks until a sweep has completed since the previous call (or
+            since the last settings change), so each trace read returns new
+            data. In continuous mode the wait is predicted from the reported
+            sweep time; in single sweep mode a sweep is started and *OPC?
+            returns when it completes.
+            Returns the seconds spent waiting.
+        '''
+        start = time.monotonic()
+        if not self.isContinuous():
+            self.write('INIT')
+            self.isOpComplete()
+        else:
+            last = self.__dict__.get('_lastSweep', start)
+            ready = last + self.getSweepTime() * self.sweepMargin
+            if ready > start:
+                time.sleep(ready - start)
+        self._lastSweep = time.monotonic()
+        return self._lastSweep - start
 
     def startScan(self):
-        self.resource.write('INIT2;*OPC?')
+        self.write('INIT2;*OPC?')
         return self.isOpComplete()
 
     def readTrace(self, n, delay=None):
@@ -242,35 +549,121 @@ class ESW(BaseInstrument):
         '''
         pd.options.display.float_format = '{:.2f}'.format
         sweepPoints = self.getSweepPoints()
-        if self.connectionType == 'TCPIP':
-            self.resource.write('FORM REAL, 32')
-            data = self.resource.query_binary_values(f'TRAC:DATA? TRACE{n}', delay=delay, data_points=sweepPoints)
-        elif self.connectionType == 'GPIB':
-            if delay:
-                time.sleep(delay)
-            self.resource.write('FORM ASCII')
-            data = self.resource.query(f'TRAC:DATA? TRACE{n}')
+        if self.connectionType == 'GPIB' and delay:
+            time.sleep(delay)
+            delay = None
+        if self.binaryTransfer or self.connectionType == 'TCPIP':
+            data = self.readTraceData(n, sweepPoints, delay)
+        else:
+            self.setFormat('ASC')
+            data = self.query(f'TRAC:DATA? TRACE{n}')
             data = data.replace('\n', '001')
             data = data.replace('001001', '001')
-            data = data.split(',')
-        frequency = np.linspace(self.getFrequencyStart(), self.getFrequencyStop(), len(data))
+            data = np.array(data.split(','), dtype=float)
+        if len(data) != sweepPoints:
+            # Settings were changed behind the mirror's back
+            self.invalidate('SWE:POIN', 'SENS:FREQ:STAR', 'SENS:FREQ:STOP')
+        frequency = self.getFrequencyAxis()
+        if len(frequency) != len(data):
+            frequency = np.linspace(self.getFrequencyStart(), self.getFrequencyStop(), len(data))
         df = pd.DataFrame(data={'Frequency (MHz)': frequency, 'Amplitude (dBuV/m)': data})
-        df['Amplitude (dBuV/m)'] = df['Amplitude (dBuV/m)'].astype(float)
         return df
 
+    def readTraceData(self, n, sweepPoints=0, delay=None):
+        ''' Returns trace n as a float32 array transferred as a REAL,32 block.
+            The array is a view on the received bytes, no values are
+            converted through Python objects.
+        '''
+        self.setFormat('REAL,32')
+        return self.resource.query_binary_values(
+            f'TRAC:DATA? TRACE{n}',
+            datatype='f',
+            container=np.ndarray,
+            delay=delay,
+            data_points=sweepPoints)
+
+    def setFormat(self, fmt):
+        ''' Trace data format, ASC or REAL,32, written only when it differs
+            from the mirrored format
+        '''
+        fmt = fmt.upper()
+        if not settingMatches(fmt, self.state.get('FORM')):
+            self.write(f'FORM {fmt}')
+            self.state['FORM'] = fmt
+
     def autoScale(self, trace):
-        self.resource.write(f'DISP:TRAC{trace}:Y:AUTO ONCE')
+        self.write(f'DISP:TRAC{trace}:Y:AUTO ONCE')
         return self.isOpComplete()
 
     def transducerOn(self, transducer):
-        self.resource.write(f'SENS1:CORR:TRAN:SEL "{transducer}"')
-        self.resource.write('CORR:TRAN ON')
+        self.write(f'SENS1:CORR:TRAN:SEL "{transducer}"')
+        self.write('CORR:TRAN ON')
+        self.state['CORR:TRAN:SEL'] = transducer
 
     def rfInput(self, inputChannel=1):
-        self.resource.write(f'INP:TYPE INPUT{inputChannel}')
-
+        self.write(f'INP:TYPE INPUT{inputChannel}')
+        self.state['INP:TYPE'] = f'INPUT{inputChannel}'
+
+
+# Threads waiting on motion, see EMCenter.waitMotions
+motionExecutor = None
+motionExecutorLock = threading.Lock()
+
+def getMotionExecutor():
+    global motionExecutor
+    with motionExecutorLock:
+        if motionExecutor is None:
+            motionExecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='motion')
+        return motionExecutor
+
+def travelTime(distance, velocity, acceleration):
+    ''' Seconds a move over distance takes from rest on a trapezoidal
+        profile, ramping to velocity in acceleration seconds
+    '''
+    distance = abs(distance)
+    velocity = max(velocity, 1e-6)
+    if distance >= velocity * acceleration:
+        return distance / velocity + acceleration
+    return 2 * np.sqrt(distance * acceleration / velocity)
+
+class MotionTracker:
+    ''' Predicts when a device reaches its target. The first estimate
+        assumes a trapezoidal profile from rest at the nominal velocity,
+        later ones use the faster of the nominal and observed velocities so
+        the prediction errs early, costing a few polls rather than dead time.
+    '''
+    def __init__(self, target, velocity, acceleration):
+        self.target = target
+        self.velocity = max(velocity, 1e-6)
+        self.acceleration = max(acceleration, 0.0)
+        self.last = None
+
+    def remaining(self, t, position):
+        ''' Seconds until arrival given position read at time t '''
+        if self.target is None:
+            return 0.0
+        distance = abs(self.target - position)
+        if self.last is None:
+            self.last = (t, position)
+            return travelTime(distance, self.velocity, self.acceleration)
+        lastTime, lastPosition = self.last
+        self.last = (t, position)
+        v = self.velocity
+        if t > lastTime:
+            v = max(v, abs(position - lastPosition) / (t - lastTime))
+        return distance / v
 
 class EMCenter(BaseInstrument):
+    # Tower cm and turntable degrees per second for each speed step. The
+    # units of S? are not documented, measured velocities take over once
+    # the device moves.
+    unitsPerSpeed = {'A': 5.0, 'B': 1.5}
+    # Completion is polled every pollInterval s from nearArrival s before
+    # the predicted arrival, positions are read at least every maxSleep s
+    nearArrival = 0.3
+    pollInterval = 0.02
+    maxSleep = 0.5
+
     def __init__(self, *args, **kwargs):
         self.tower = 'A'
         self.turntable = 'B'
@@ -284,17 +677,20 @@ class EMCenter(BaseInstrument):
             controller.setPosition(controller.tower, 150)
         '''
         self.resource.write(f'1{device}SK {position}\n')
+        self.state[f'{device}SK'] = float(position)
 
     def setAcceleration(self, device, seconds):
         ''' Seconds values 0.1 to 30.0
             Example
             controller.setAcceleration(controller.tower, 2)
         '''
-        self.resource.write('1{device}ACC {seconds}\n')
+        self.resource.write(f'1{device}ACC {seconds}\n')
+        self.state[f'{device}ACC'] = float(seconds)
 
     def setSpeed(self, device, speed):
         ''' Speed integer 1 to 8 '''
         self.resource.write(f'1{device}S{speed}\n')
+        self.state[f'{device}S'] = float(speed)
 
     def getSpeed(self, device):
         return self.resource.query(f'1{device}S?\n')
@@ -302,6 +698,68 @@ class EMCenter(BaseInstrument):
     def getAcceleration(self, device):
         return self.resource.query(f'1{device}ACC?\n')
 
+    def motionTracker(self, device, target=None):
+        ''' MotionTracker of a move to target, the last position set by
+            default. Speed and acceleration are read once and mirrored.
+        '''
+        if target is None:
+            target = self.state.get(f'{device}SK')
+        speed = self.state.get(f'{device}S')
+        if speed is None:
+            speed = self.state[f'{device}S'] = float(self.getSpeed(device))
+        acceleration = self.state.get(f'{device}ACC')
+        if acceleration is None:
+            acceleration = self.state[f'{device}ACC'] = float(self.getAcceleration(device))
+        return MotionTracker(target, speed * self.unitsPerSpeed.get(device, 1.0), acceleration)
+
+    def nextCheck(self, remaining):
+        ''' Seconds to sleep before checking a device again '''
+        if remaining > self.nearArrival:
+            return min(remaining - self.nearArrival, self.maxSleep)
+        return self.pollInterval
+
+    def waitMotion(self, device, target=None, timeout=None, progress=None):
+        ''' Returns the position device stops at. Sleeps until shortly
+            before the predicted arrival, then polls *OPC? tightly.
+            progress(position) is called with every position read.
+            Example:
+            controller.setPosition(controller.tower, 400)
+            controller.waitMotion(controller.tower)
+        '''
+        tracker = self.motionTracker(device, target)
+        start = time.monotonic()
+        deadline = None
+        while True:
+            stopped = self.isOpComplete(device)
+            position = float(self.getCurrentPosition(device))
+            if progress is not None:
+                progress(position)
+            if stopped:
+                return position
+            now = time.monotonic()
+            remaining = tracker.remaining(now, position)
+            if deadline is None:
+                deadline = start + (2 * remaining + 30 if timeout is None else timeout)
+            if now > deadline:
+                raise TimeoutError(f'{self} device {device} still moving at {position}')
+            time.sleep(self.nextCheck(remaining))
+
+    def waitMotions(self, devices, timeout=None, progress=None):
+        ''' Waits on several devices at once, returns {device: Future}
+            resolving to the position each stops at.
+            progress(device, position) is called with every position read.
+            Example:
+            controller.setPosition(controller.tower, 400)
+            controller.setPosition(controller.turntable, 180)
+            futures = controller.waitMotions([controller.tower, controller.turntable])
+            futures[controller.turntable].result()
+        '''
+        futures = {}
+        for device in devices:
+            callback = None if progress is None else (lambda position, device=device: progress(device, position))
+            futures[device] = getMotionExecutor().submit(self.waitMotion, device, None, timeout, callback)
+        return futures
+
     def getCurrentPosition(self, device):
         return self.resource.query(f'1{device}CP?\n')
 
@@ -358,11 +816,11 @@ class EMCenter(BaseInstrument):
         self.resource.write(f'1{device}*CLS\n')
 
     def isOpComplete(self, device):
-        ''' Returns 1 if in motion'''
+        ''' Returns 1 once device has stopped, 0 while in motion'''
         return int(self.resource.query(f'1{device}*OPC?\n'))
 
     def wait(self, device):
-        self.resource.writef('1{device}*WAI\n')
+        self.resource.write(f'1{device}*WAI\n')
 
 def faraday_scan():
     esw = ESW(connectionType='GPIB', connectionId=20, log=True)
@@ -380,6 +838,7 @@ if __name__ == '__main__':
     for i in range(5):
         trace = esw.readTrace(1)
         print(trace)
+    print(esw.getCommandStats().format())
     """
     ctrl = EMCenter(connectionType='GPIB', connectionId='7')
     ctrl.establishConnection()
@@ -2,14 +2,24 @@ from PyQt5 import QtWidgets, QtCore
 from ccFactorsUi import Ui_Factors
 from dfModel import DataFrameModel
 from pathlib import Path
+import hashlib
+import json
+import numpy as np
 import pandas as pd
 import shelve
+import constants
 
 class CorrectionFactors:
     xcol = 'Frequency (MHz)'
+    total = 'Total Correction Factor'
+    # Factors extend this far (MHz) past their first and last frequency
+    tolerance = 2
+    # Bump when the way the factor table is built changes
+    cacheVersion = 1
 
-    def __init__(self, configPath=Path(__file__).parent.absolute() / 'config', fRange='lf'):
-        self.configPath = configPath
+    def __init__(self, configPath=None, fRange='lf'):
+        # Defaults to constants.CONFIG_FP at the time of the call
+        self.configPath = constants.CONFIG_FP if configPath is None else configPath
         self.fRange = fRange
         
     @property
@@ -31,9 +41,81 @@ class CorrectionFactors:
 
         return factorsDict
 
+    @property
+    def cachePath(self):
+        return self.configPath / 'cache' / f'{self.fRange}.npz'
+
     def loadDict(self):
+        # Load the factor table from the cache unless a factor file changed
+        factorsDict = self.getFactorsDict()
+        cached, sources = self.loadCache(factorsDict)
+        if cached is None:
+            self.buildTable(factorsDict)
+            self.saveCache(sources)
+        else:
+            self.cf = cached
+        self.compiled = {}
+
+    def getSources(self, factorsDict, previous=()):
+        ''' Describes each factor file by path, size, mtime and content hash.
+            Hashes from previous are reused for files whose size and mtime
+            are unchanged.
+        '''
+        known = {(p['factor'], p['path'], p['size'], p['mtime']): p['sha1'] for p in previous}
+        sources = []
+        for factor, fp in factorsDict.items():
+            if fp.exists() and fp != Path():
+                stat = fp.stat()
+                source = {
+                    'factor': factor,
+                    'path': str(fp),
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime_ns,
+                }
+                sha1 = known.get((factor, str(fp), stat.st_size, stat.st_mtime_ns))
+                if sha1 is None:
+                    sha1 = hashlib.sha1(fp.read_bytes()).hexdigest()
+                source['sha1'] = sha1
+                sources.append(source)
+        return sources
+
+    def loadCache(self, factorsDict):
+        ''' Returns (cached factor table or None, current sources) '''
+        try:
+            with np.load(self.cachePath, allow_pickle=False) as cache:
+                key = json.loads(str(cache['key']))
+                columns = [str(c) for c in cache['columns']]
+                values = cache['values']
+        except (OSError, KeyError, ValueError):
+            return None, self.getSources(factorsDict)
+
+        sources = self.getSources(factorsDict, key.get('sources', ()))
+        if key.get('version') != self.cacheVersion or self.contentKey(sources) != self.contentKey(key['sources']):
+            return None, sources
+        if sources != key['sources']:
+            # Files were touched without changing, remember the new mtimes
+            self.saveCache(sources, pd.DataFrame(values, columns=columns))
+        return pd.DataFrame(values, columns=columns), sources
+
+    def contentKey(self, sources):
+        return [(source['factor'], source['path'], source['sha1']) for source in sources]
+
+    def saveCache(self, sources, cf=None):
+        cf = self.cf if cf is None else cf
+        key = {'version': self.cacheVersion, 'sources': sources}
+        try:
+            self.cachePath.parent.mkdir(exist_ok=True)
+            with open(self.cachePath, 'wb') as f:
+                np.savez(f,
+                    key=np.array(json.dumps(key)),
+                    columns=np.array([str(c) for c in cf.columns]),
+                    values=cf.to_numpy(dtype=float))
+        except OSError:
+            pass
+
+    def buildTable(self, factorsDict):
         self.cf = pd.DataFrame(columns=[self.xcol])
-        for factor, fp in self.getFactorsDict().items():
+        for factor, fp in factorsDict.items():
             if fp.exists() and fp != Path():
                 cfLocal = pd.read_csv(
                     fp,
@@ -55,9 +137,34 @@ class CorrectionFactors:
         self.cf.sort_values(self.xcol, inplace=True)
         self.cf = self.interpolate_cf(self.cf)
         self.cf.dropna(inplace=True)
-        self.cf['Total Correction Factor'] = self.cf.sum(axis=1)
+        self.cf[self.total] = self.cf.sum(axis=1)
         self.cf.reset_index(inplace=True)
 
+    def getCorrection(self, frequency):
+        ''' Returns the total correction factor interpolated onto the
+            frequency grid (MHz), NaN where no factors are defined. Vectors
+            are compiled once per range and sweep grid and then reused.
+        '''
+        key = (str(self.fRange), frequency[0], frequency[-1], len(frequency))
+        correction = self.compiled.get(key)
+        if correction is None:
+            correction = self.compileCorrection(frequency)
+            self.compiled[key] = correction
+        return correction
+
+    def compileCorrection(self, frequency):
+        frequency = np.asarray(frequency, dtype=float)
+        cfFreqs = self.cf[self.xcol].to_numpy(dtype=float)
+        cfTotal = self.cf[self.total].to_numpy(dtype=float)
+        correction = np.full(frequency.shape, np.nan)
+        if len(cfFreqs):
+            correction = np.interp(frequency, cfFreqs, cfTotal)
+            outside = ((frequency < cfFreqs[0] - self.tolerance)
+                | (frequency > cfFreqs[-1] + self.tolerance))
+            correction[outside] = np.nan
+        correction.flags.writeable = False
+        return correction
+
     def interpolate_cf(self, df):
         df.set_index(self.xcol, inplace=True)
         for col in df.columns.tolist():
@@ -140,6 +247,9 @@ class FactorsView(QtWidgets.QDialog, Ui_Factors):
         self.factors.loadDict()
         model = DataFrameModel(self.factors.cf)
         self.factorTable.setModel(model)
+        # Keep the table's own order until a header is clicked
+        self.factorTable.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.factorTable.setSortingEnabled(True)
 
     def getFilepaths(self):
         filepaths = {}
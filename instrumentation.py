@@ -0,0 +1,220 @@
+'''
+Per command timing of instrument I/O
+CommandStats keeps call counts, latency and transfer size histograms for
+every SCPI command header sent on a connection. InstrumentedResource wraps
+a VISA resource and records each write, read and query into it.
+Example usage:
+    stats = CommandStats()
+    drivers.setCommandStats(stats)
+    ...
+    print(stats.format())
+    stats.dump('scpi_stats.json')
+'''
+from pathlib import Path
+import json
+import math
+import re
+import threading
+import time
+
+import numpy as np
+
+# Latency bins per decade from 1 us to 100 s, transfer size bins per power of 2
+LATENCY_BINS_PER_DECADE = 4
+LATENCY_MIN_EXPONENT = -6
+LATENCY_BINS = 8 * LATENCY_BINS_PER_DECADE + 1
+SIZE_BINS = 33
+
+HEADER = re.compile(r'\s*([^\s;]*)')
+
+
+def commandHeader(message):
+    ''' Returns the header a message is counted under, e.g.
+        'TRAC:DATA? TRACE1' -> 'TRAC:DATA?', '1ACP?\\n' -> '1ACP?'.
+        Semicolon joined messages count as their first header plus ';...'
+    '''
+    if isinstance(message, bytes):
+        message = message.decode('ascii', 'replace')
+    header = HEADER.match(message).group(1).lstrip(':')
+    if ';' in message.strip().rstrip(';'):
+        header += ';...'
+    return header
+
+
+def latencyBin(seconds):
+    if seconds <= 0:
+        return 0
+    index = int((math.log10(seconds) - LATENCY_MIN_EXPONENT) * LATENCY_BINS_PER_DECADE) + 1
+    return min(max(index, 0), LATENCY_BINS - 1)
+
+
+def latencyEdges():
+    ''' Upper edge (s) of every latency bin '''
+    exponents = LATENCY_MIN_EXPONENT + np.arange(LATENCY_BINS) / LATENCY_BINS_PER_DECADE
+    return 10.0 ** exponents
+
+
+def sizeBin(nbytes):
+    return min(int(nbytes).bit_length(), SIZE_BINS - 1)
+
+
+class CommandCounter:
+    __slots__ = ('calls', 'seconds', 'bytes', 'minimum', 'maximum', 'latency', 'size')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.latency = [0] * LATENCY_BINS
+        self.size = [0] * SIZE_BINS
+
+    def add(self, seconds, nbytes):
+        self.calls += 1
+        self.seconds += seconds
+        self.bytes += nbytes
+        if seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+        self.latency[latencyBin(seconds)] += 1
+        self.size[sizeBin(nbytes)] += 1
+
+    def percentile(self, q):
+        ''' Upper edge of the latency bin holding the q-th percentile (s) '''
+        if not self.calls:
+            return math.nan
+        rank = np.searchsorted(np.cumsum(self.latency), q / 100 * self.calls)
+        return min(float(latencyEdges()[rank]), self.maximum)
+
+
+class CommandStats:
+    ''' Counters keyed by (resource, operation, command header) '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def __getstate__(self):
+        with self.lock:
+            return {'counters': self.counters}
+
+    def __setstate__(self, state):
+        self.lock = threading.Lock()
+        self.counters = state['counters']
+
+    def record(self, resource, operation, message, seconds, nbytes):
+        key = (resource, operation, commandHeader(message))
+        with self.lock:
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = CommandCounter()
+            counter.add(seconds, nbytes)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+    def summary(self):
+        ''' Returns one dict per command, slowest total time first '''
+        with self.lock:
+            items = list(self.counters.items())
+        rows = []
+        for (resource, operation, header), counter in items:
+            rows.append({
+                'resource': resource,
+                'operation': operation,
+                'command': header,
+                'calls': counter.calls,
+                'total_s': counter.seconds,
+                'mean_s': counter.seconds / counter.calls,
+                'min_s': counter.minimum,
+                'p50_s': counter.percentile(50),
+                'p95_s': counter.percentile(95),
+                'max_s': counter.maximum,
+                'bytes': counter.bytes,
+            })
+        return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+    def format(self):
+        lines = [f'{"Resource":<18}{"Op":<8}{"Command":<22}{"Calls":>7}{"Total ms":>11}'
+            f'{"Mean ms":>10}{"p95 ms":>10}{"Max ms":>10}{"Bytes":>12}']
+        for row in self.summary():
+            lines.append(f'{row["resource"]:<18}{row["operation"]:<8}{row["command"]:<22}'
+                f'{row["calls"]:>7}{row["total_s"] * 1e3:>11.2f}{row["mean_s"] * 1e3:>10.3f}'
+                f'{row["p95_s"] * 1e3:>10.3f}{row["max_s"] * 1e3:>10.3f}{row["bytes"]:>12}')
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        ''' Writes the summary and raw histograms to a JSON file '''
+        with self.lock:
+            items = list(self.counters.items())
+        histograms = [{
+            'resource': resource,
+            'operation': operation,
+            'command': header,
+            'latency': counter.latency,
+            'size': counter.size,
+        } for (resource, operation, header), counter in items]
+        Path(path).write_text(json.dumps({
+            'latency_edges_s': latencyEdges().tolist(),
+            'size_edges_bytes': [2 ** i for i in range(SIZE_BINS)],
+            'summary': self.summary(),
+            'histograms': histograms,
+        }, indent=2))
+
+
+class InstrumentedResource:
+    ''' Wraps a VISA resource, timing every transfer into stats. Anything
+        else is passed through to the resource.
+    '''
+    def __init__(self, resource, stats, name=None):
+        object.__setattr__(self, 'resource', resource)
+        object.__setattr__(self, 'stats', stats)
+        object.__setattr__(self, 'name', name or getattr(resource, 'resource_name', ''))
+        object.__setattr__(self, 'lastCommand', '')
+
+    def __getattr__(self, attribute):
+        if attribute == 'resource':
+            # Not set yet, e.g. while unpickling
+            raise AttributeError(attribute)
+        return getattr(self.resource, attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.resource, attribute, value)
+
+    def record(self, operation, message, start, nbytes):
+        self.stats.record(self.name, operation, message, time.perf_counter() - start, nbytes)
+
+    def write(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.resource.write(message, *args, **kwargs)
+        object.__setattr__(self, 'lastCommand', message)
+        self.record('write', message, start, len(message))
+        return result
+
+    def read(self, *args, **kwargs):
+        # Reads are counted under the command that was last written
+        start = time.perf_counter()
+        response = self.resource.read(*args, **kwargs)
+        self.record('read', self.lastCommand, start, len(response))
+        return response
+
+    def read_raw(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = self.resource.read_raw(*args, **kwargs)
+        self.record('read', self.lastCommand, start, len(response))
+        return response
+
+    def query(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        response = self.resource.query(message, *args, **kwargs)
+        self.record('query', message, start, len(message) + len(response))
+        return response
+
+    def query_binary_values(self, message, *args, **kwargs):
+        start = time.perf_counter()
+        values = self.resource.query_binary_values(message, *args, **kwargs)
+        nbytes = values.nbytes if hasattr(values, 'nbytes') else 4 * len(values)
+        self.record('binary', message, start, len(message) + nbytes)
+        return values
@@ -5,7 +5,6 @@ from pathlib import Path
 
 from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtCore import QThread, pyqtSignal
-from matplotlib.animation import FuncAnimation
 import numpy as np
 import pandas as pd
 
@@ -13,6 +12,8 @@ from ccMainUi import Ui_ccMain
 from ccModel import ConfidenceCheck
 from dfModel import DataFrameModel
 from factors import FactorsView
+from results import GoldenValuesMissing
+from ringbuffer import FrameRing
 from settings import SettingsView
 import constants
 
@@ -22,19 +23,55 @@ class AntennaSweepThread(QThread):
     def __init__(self, cc):
         QThread.__init__(self)
         self.cc = cc
-        self.re = ['lf', 'mf', 'hf']
 
     def run(self):
-        if self.cc.fRange in self.re:
+        if self.cc.fRange in self.cc.towerMaximum:
             self.cc.initController()
-            if self.cc.fRange == 'lf':
-                self.cc.sweepAntenna(400)
-            else:
-                self.cc.sweepAntenna(300)
+            self.cc.sweepAntenna(self.cc.towerMaximum[self.cc.fRange])
         self.signal.emit('Done')
 
+class AcquisitionThread(QThread):
+    signal = pyqtSignal('PyQt_PyObject')
+
+    def __init__(self, cc, ring):
+        QThread.__init__(self)
+        self.cc = cc
+        self.ring = ring
+        self.running = False
+        self.paused = False
+
+    def run(self):
+        # Read and correct both traces into the ring until stopped
+        self.running = True
+        while self.running:
+            if self.paused:
+                self.msleep(50)
+                continue
+            try:
+                # One read of both traces per completed sweep
+                self.cc.waitSweep()
+                traceMax = self.cc.readCorrectedTrace(1)
+                traceWrit = self.cc.readCorrectedTrace(2)
+            except Exception as e:
+                self.signal.emit(f'Could not read analyzer.\n{e}')
+                break
+            self.cc.recordFrame(traceMax, traceWrit)
+            self.ring.push(
+                traceMax[constants.XCOL].to_numpy(),
+                traceMax[constants.CORRECTED].to_numpy(),
+                traceWrit[constants.CORRECTED].to_numpy())
+        self.running = False
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
 class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
-    cc = ConfidenceCheck()        
+    # Created with the window, see fRange
+    cc = None
+    # Keep the raw traces of each run in constants.SESSIONS_FP, limited to
+    # constants.MAX_SESSIONS and MAX_SESSIONS_BYTES
+    recordSessions = False
     appFp = constants.APP_FP
     corrected = constants.CORRECTED
     ycol = constants.YCOL
@@ -46,11 +83,19 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
         self.setUser()
         self.run = 'RE 30MHz - 1GHz'
         self.fRange = 'lf'
-        self.updateResultsTable(self.cc.goldenValues)
         self.toggleLogSlot(False)
         self.statusBar().showMessage('Select a frequency range to run')
         self.antennaThread = AntennaSweepThread(self.cc)
         self.antennaThread.signal.connect(self.sweepFinished)
+        self.ring = FrameRing()
+        self.acquisitionThread = AcquisitionThread(self.cc, self.ring)
+        self.acquisitionThread.signal.connect(self.debugOut)
+        # Redraws the traces over the plot's cached background
+        self.plotTimer = QtCore.QTimer(self)
+        self.plotTimer.setInterval(40)
+        self.plotTimer.timeout.connect(self.animate)
+        # Open the results store (and Excel) once the window is showing
+        QtCore.QTimer.singleShot(0, self.loadGoldenValues)
 
     @property
     def fRange(self):
@@ -58,8 +103,8 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
 
     @fRange.setter
     def fRange(self, val):
+        self._fRange = val
         if self.cc:
-            self._fRange = val
             self.cc.fRange = val
         else:
             self.cc = ConfidenceCheck(fRange=val)
@@ -97,6 +142,16 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
         model = DataFrameModel(df)
         self.resultTable.setModel(model)
         self.resultTable.resizeColumnsToContents()
+        # Keep the table's own order until a header is clicked
+        self.resultTable.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.resultTable.setSortingEnabled(True)
+
+    def loadGoldenValues(self):
+        try:
+            self.updateResultsTable(self.cc.goldenValues)
+        except GoldenValuesMissing as e:
+            self.updateResultsTable(pd.DataFrame())
+            self.debugOut(f'{e}. Import them with results.py or pick another results file.')
 
     def logFactors(self):
         for factor, fp in self.cc.factors.getFactorsDict().items():
@@ -113,6 +168,9 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
             self.mplWidget.clearPlot()
             self.debugOut(f'{self.nameEdit.text()} executed {self.run} scan')
             self.statusBar().showMessage(self.cc.initAnalyzer())
+            if self.recordSessions:
+                self.cc.startRecording(constants.SESSIONS_FP,
+                    constants.MAX_SESSIONS, constants.MAX_SESSIONS_BYTES)
             try:
                 self.initAnimate()
                 self.antennaThread.start()
@@ -122,20 +180,23 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
                 self.showSettingsSlot()
         elif self.runButton.text() == 'Pause':
             self.paused()
-            self.ani.event_source.stop()
+            self.acquisitionThread.paused = True
+            self.plotTimer.stop()
         elif self.runButton.text() == 'Resume':
             self.inProgress()
-            self.ani.event_source.start()
+            self.acquisitionThread.paused = False
+            self.plotTimer.start()
 
     @QtCore.pyqtSlot()
     def sweepFinished(self):
         self.standby()
-        self.ani.event_source.stop()
+        self.plotTimer.stop()
+        self.acquisitionThread.stop()
+        self.stopRecording()
         self.cc.findPeaks()
         self.updateResultsTable(self.cc.getResultsFrame())
         if self.cc.checkPass():
-            self.cc.insertDataToExcel(self.nameEdit.text())
-            self.cc.wb.save()
+            self.cc.saveResults(self.nameEdit.text())
             self.statusBar().showMessage('Confidence Check Passed.  Data saved')
             self.debugOut('Confidence Check Passed.  Data saved')
         else:
@@ -145,15 +206,23 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
     @QtCore.pyqtSlot()
     def cancelSlot(self):
         self.standby()
-        self.ani.event_source.stop()
+        self.plotTimer.stop()
+        self.acquisitionThread.stop()
+        self.stopRecording()
+
+    def stopRecording(self):
+        path = self.cc.stopRecording()
+        if path and path.exists():
+            self.debugOut(f'Session recorded to {path}')
 
     def initPlot(self):
-        self.line[0].set_ydata([np.nan]*len(self.traceMax))
-        self.line[1].set_ydata([np.nan]*len(self.traceMax))
-        return self.line
+        empty = np.full(len(self.traceMax), np.nan)
+        self.mplWidget.updateTrace(self.line[0], empty, draw=False)
+        self.mplWidget.updateTrace(self.line[1], empty)
 
     def initAnimate(self):
-        self.traceMax = self.cc.readCorrectedTrace(1, 0.5)
+        self.cc.waitSweep()
+        self.traceMax = self.cc.readCorrectedTrace(1)
         self.traceWrit = self.cc.readCorrectedTrace(2)
         self.line = [self.mplWidget.graph(
             x = self.traceMax[self.xcol].values, 
@@ -167,23 +236,26 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
             label = f'{self.run} Clear/Write', 
             xLabel = self.xcol, 
             yLabel = self.corrected))
-        self.ani = FuncAnimation(self.mplWidget.figure, 
-            self.animate, 
-            init_func=self.initPlot, 
-            interval=2, 
-            blit=True)
-
-    def animate(self, i):
-        traceMax = self.cc.readCorrectedTrace(1)
-        traceWrit = self.cc.readCorrectedTrace(2)
-        self.line[0].set_ydata(traceMax[self.corrected])
-        self.line[1].set_ydata(traceWrit[self.corrected])
-        return self.line
+        self.initPlot()
+        self.plotTimer.start()
+        # Traces are read on the acquisition thread, animate only draws
+        self.drawnFrame = 0
+        self.ring.clear()
+        self.acquisitionThread.paused = False
+        self.acquisitionThread.start()
+
+    @QtCore.pyqtSlot()
+    def animate(self):
+        count, frequency, traces = self.ring.latest()
+        if count != self.drawnFrame and len(traces[0]) == len(self.traceMax):
+            self.drawnFrame = count
+            self.mplWidget.updateTrace(self.line[0], traces[0], draw=False)
+            self.mplWidget.updateTrace(self.line[1], traces[1])
 
     def radioSelect(self, radio, f):
         self.fRange = f
         self.run = radio.text()
-        self.updateResultsTable(self.cc.goldenValues)
+        self.loadGoldenValues()
         self.logFactors()
 
     @QtCore.pyqtSlot()
@@ -225,6 +297,8 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
         ccSettings = SettingsView(ccFile=str(self.cc.filepath), fRange=self.fRange)
         if ccSettings.exec_():
             ccSettings.saveSettings()
+            self.cc.filepath = ccSettings.filepathEdit.text()
+            self.loadGoldenValues()
         else:
             self.debugOut('Settings not saved')
 
@@ -263,6 +337,7 @@ class EasyCC(QtWidgets.QMainWindow, Ui_ccMain):
 
     @QtCore.pyqtSlot()
     def close(self):
+        self.acquisitionThread.stop()
         self.cc.exit()
         super().close()
 
@@ -0,0 +1,190 @@
+'''
+Ordering of tower, polarity and turntable moves covering a set of antenna
+heights, polarizations and turntable azimuths
+The analyzer max holds while a plan runs, so a height is covered whenever
+the tower passes through it. Every candidate order is timed with the
+trapezoidal profile of each axis and the fastest one kept. The turntable
+turns during polarity switches and tower travel; the tower is never moved
+while the polarity changes.
+Example usage:
+    planner = MotionPlanner.fromController(ctrl)
+    plan = planner.plan(currentState(ctrl), heights=(100, 400), azimuths=range(0, 360, 90))
+    print(plan.format())
+    runPlan(ctrl, plan)
+'''
+from itertools import permutations, product
+
+from drivers import travelTime
+
+
+class Step:
+    ''' Moves started together. The turntable starts at once, the tower once
+        the polarity has been switched. None leaves an axis where it is.
+    '''
+    def __init__(self, tower=None, turntable=None, polarity=None):
+        self.tower = tower
+        self.turntable = turntable
+        self.polarity = polarity
+
+    def __repr__(self):
+        return f'Step(tower={self.tower}, turntable={self.turntable}, polarity={self.polarity})'
+
+    def __eq__(self, other):
+        return isinstance(other, Step) and vars(self) == vars(other)
+
+
+class Plan:
+    def __init__(self, steps, start, times):
+        ''' start -> {'tower', 'turntable', 'polarity'} the plan begins from
+            times -> seconds taken by each step
+        '''
+        self.steps = steps
+        self.start = start
+        self.times = times
+
+    @property
+    def duration(self):
+        return sum(self.times)
+
+    def format(self):
+        lines = []
+        elapsed = 0.0
+        for step, seconds in zip(self.steps, self.times):
+            moves = [f'{name} {getattr(step, name)}' for name in ('polarity', 'tower', 'turntable')
+                if getattr(step, name) is not None]
+            lines.append(f'{elapsed:>8.1f} s  {"  ".join(moves)}')
+            elapsed += seconds
+        lines.append(f'{elapsed:>8.1f} s  done')
+        return '\n'.join(lines)
+
+
+class MotionPlanner:
+    # Seconds a polarity switch is assumed to take
+    polarityTime = 5.0
+
+    def __init__(self, towerVelocity=15.0, towerAcceleration=1.0,
+            turntableVelocity=4.5, turntableAcceleration=1.0, polarityTime=None):
+        ''' Velocities in cm/s and degrees/s, accelerations as ramp seconds '''
+        self.towerVelocity = towerVelocity
+        self.towerAcceleration = towerAcceleration
+        self.turntableVelocity = turntableVelocity
+        self.turntableAcceleration = turntableAcceleration
+        if polarityTime is not None:
+            self.polarityTime = polarityTime
+
+    @classmethod
+    def fromController(cls, ctrl, **kwargs):
+        ''' Planner timed with the speed and acceleration set on ctrl '''
+        tower = ctrl.motionTracker(ctrl.tower)
+        turntable = ctrl.motionTracker(ctrl.turntable)
+        return cls(tower.velocity, tower.acceleration,
+            turntable.velocity, turntable.acceleration, **kwargs)
+
+    def stepTime(self, state, step):
+        ''' Seconds step takes from state, the state is updated '''
+        switch = 0.0
+        if step.polarity is not None and step.polarity != state['polarity']:
+            switch = self.polarityTime
+            state['polarity'] = step.polarity
+        tower = turntable = 0.0
+        if step.tower is not None:
+            tower = travelTime(step.tower - state['tower'], self.towerVelocity, self.towerAcceleration)
+            state['tower'] = step.tower
+        if step.turntable is not None:
+            turntable = travelTime(step.turntable - state['turntable'],
+                self.turntableVelocity, self.turntableAcceleration)
+            state['turntable'] = step.turntable
+        return max(switch + tower, turntable)
+
+    def prune(self, start, steps):
+        ''' Drops moves to where an axis already is and steps left empty '''
+        state = dict(start)
+        pruned = []
+        for step in steps:
+            step = Step(**{name: value for name, value in vars(step).items()
+                if value is not None and value != state[name]})
+            if vars(step) != vars(Step()):
+                state.update({name: value for name, value in vars(step).items() if value is not None})
+                pruned.append(step)
+        return pruned
+
+    def candidates(self, heights, polarities, azimuths, grid):
+        ''' Step lists covering every height and azimuth in each polarity.
+            Tower legs alternate direction so no leg is travelled empty.
+            With grid each azimuth gets a full tower leg, otherwise the
+            turntable sweeps its azimuths during the leg.
+        '''
+        low, high = (min(heights), max(heights)) if heights else (None, None)
+        other = lambda height: high if height == low else low
+        azimuths = sorted(set(azimuths))
+        for order, towerFirst, turnFirst in product(
+                permutations(polarities), (low, high), (0, -1)):
+            steps = []
+            tower = towerFirst
+            if grid:
+                sequence = azimuths if turnFirst == 0 else azimuths[::-1]
+                for polarity in order:
+                    for azimuth in sequence or [None]:
+                        steps.append(Step(tower, azimuth, polarity))
+                        steps.append(Step(other(tower)))
+                        tower = other(tower)
+                    sequence = sequence[::-1]
+            else:
+                ends = (azimuths[turnFirst], azimuths[-1 - turnFirst]) if azimuths else (None, None)
+                for polarity in order:
+                    steps.append(Step(tower, ends[0], polarity))
+                    steps.append(Step(other(tower), ends[1]))
+                    tower = other(tower)
+                    ends = ends[::-1]
+            yield steps
+
+    def plan(self, start, heights=(), polarities='VH', azimuths=(), grid=False, returnTower=None):
+        ''' Returns the fastest Plan from start covering the coverage
+            start -> {'tower', 'turntable', 'polarity'}, polarity may be None
+            heights -> tower positions (cm), the span between them is swept
+            azimuths -> turntable positions (degrees) visited
+            grid -> sweep every height at every azimuth
+            returnTower -> tower position (cm) the plan ends at, None ends
+                           wherever the last leg does
+        '''
+        if not polarities:
+            raise ValueError('At least one polarity is needed')
+        best = None
+        for steps in self.candidates(heights, list(dict.fromkeys(polarities)), azimuths, grid):
+            if returnTower is not None:
+                steps.append(Step(returnTower))
+            steps = self.prune(start, steps)
+            state = dict(start)
+            times = [self.stepTime(state, step) for step in steps]
+            if best is None or sum(times) < best.duration:
+                best = Plan(steps, dict(start), times)
+        return best
+
+
+def currentState(ctrl):
+    ''' Tower, turntable and polarity ctrl reports now '''
+    return {
+        'tower': float(ctrl.getCurrentPosition(ctrl.tower)),
+        'turntable': float(ctrl.getCurrentPosition(ctrl.turntable)),
+        'polarity': ctrl.getAntennaPolarity(),
+    }
+
+
+def runPlan(ctrl, plan, progress=None, timeout=None):
+    ''' Moves ctrl through plan, each step waiting on every axis it moves.
+        progress(device, position) is called with every position read.
+    '''
+    for step in plan.steps:
+        devices = []
+        if step.turntable is not None:
+            ctrl.setPosition(ctrl.turntable, step.turntable)
+            devices.append(ctrl.turntable)
+        if step.polarity is not None:
+            ctrl.setPolarity(step.polarity)
+            # The antenna turns on the tower, which reports busy meanwhile
+            ctrl.waitMotion(ctrl.tower, timeout=timeout)
+        if step.tower is not None:
+            ctrl.setPosition(ctrl.tower, step.tower)
+            devices.append(ctrl.tower)
+        for future in ctrl.waitMotions(devices, timeout, progress).values():
+            future.result()
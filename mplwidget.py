@@ -2,8 +2,42 @@ from matplotlib.backends.backend_qt5agg import (
     FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
 from matplotlib.figure import Figure
 from PyQt5.QtWidgets import QWidget, QVBoxLayout
+import numpy as np
+
+
+def minMaxDecimate(x, y, columns, lower=None, upper=None):
+    ''' Returns sorted indices of the smallest and largest y in each of
+        columns equal width bins between lower and upper, plus the points
+        just outside them. x must be sorted ascending. All-NaN bins keep
+        their first point so gaps stay visible.
+    '''
+    lower = x[0] if lower is None else lower
+    upper = x[-1] if upper is None else upper
+    first = max(np.searchsorted(x, lower, side='left') - 1, 0)
+    last = min(np.searchsorted(x, upper, side='right') + 1, len(x))
+    if last - first <= 2 * columns or upper <= lower:
+        return np.arange(first, last)
+
+    xs = x[first:last]
+    ys = y[first:last]
+    bins = np.clip(((xs - lower) / (upper - lower) * columns).astype(np.intp), 0, columns - 1)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    counts = np.diff(np.r_[starts, len(xs)])
+    segment = np.repeat(np.arange(len(starts)), counts)
+
+    keep = [starts, starts + counts - 1]
+    for reduce in (np.fmin, np.fmax):
+        extreme = np.repeat(reduce.reduceat(ys, starts), counts)
+        hits = np.flatnonzero(ys == extreme)
+        segments, firstHit = np.unique(segment[hits], return_index=True)
+        keep.append(hits[firstHit])
+    return first + np.unique(np.concatenate(keep))
+
 
 class MplWidget(QWidget):
+    # Plot at most two points per pixel column of the axes
+    decimate = True
+
     def __init__(self, centralWidget):
         super(MplWidget, self).__init__()
         layout = QVBoxLayout()
@@ -15,6 +49,15 @@ class MplWidget(QWidget):
         layout.addWidget(self.canvas)
         layout.addWidget(toolbar)
         self.setLayout(layout)
+        self.traces = {}
+        self.background = None
+        self.backgroundLimits = None
+        self.canvas.mpl_connect('draw_event', self.cacheBackground)
+        self.connectLimits()
+
+    def connectLimits(self):
+        # Axes.clear() drops callbacks, reconnect after clearing
+        self.mplPlot.callbacks.connect('xlim_changed', self.limitsChanged)
 
     def setAxisLabels(self, x=None, y=None):
         if x:
@@ -28,15 +71,91 @@ class MplWidget(QWidget):
 
     def drawPlot(self):
         self.mplPlot.legend(loc=0, framealpha=0.5, fontsize='small')
-        self.canvas.draw()
+        # Several graph calls in a row render once
+        self.canvas.draw_idle()
 
     def clearPlot(self):
+        self.traces.clear()
+        self.background = None
         self.mplPlot.clear()
         self.mplPlot.grid()
+        self.connectLimits()
         self.drawPlot()
 
+    def columns(self):
+        return max(int(self.mplPlot.bbox.width), 1)
+
+    def setLineData(self, line, x=None, y=None):
+        ''' Stores the full resolution data of line and plots it decimated
+            to the current x range and axes width. x or y default to the
+            stored data.
+        '''
+        fullX, fullY = self.traces.get(line, (None, None))
+        x = fullX if x is None else np.asarray(x, dtype=float)
+        y = fullY if y is None else np.asarray(y, dtype=float)
+        self.traces[line] = (x, y)
+        if self.decimate and len(x) > 2 * self.columns():
+            index = minMaxDecimate(x, y, self.columns(), *self.mplPlot.get_xlim())
+            line.set_data(x[index], y[index])
+        else:
+            line.set_data(x, y)
+
+    def limitsChanged(self, axes):
+        # Zoom or pan, decimate again for the new x range
+        for line in self.traces:
+            self.setLineData(line)
+
+    def limits(self):
+        return self.mplPlot.get_xlim(), self.mplPlot.get_ylim()
+
+    def cacheBackground(self, event=None):
+        ''' Called after every full draw. Animated lines are left out of a
+            full draw, so the figure without them is kept as the background
+            and the lines are drawn on top.
+        '''
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.backgroundLimits = self.limits()
+        for line in self.animatedLines():
+            self.mplPlot.draw_artist(line)
+
+    def animatedLines(self):
+        return [line for line in self.traces if line.get_animated()]
+
+    def fitY(self, y):
+        ''' Rescales y when autoscaling and y leaves the current limits '''
+        if not self.mplPlot.get_autoscaley_on() or np.isnan(y).all():
+            return
+        bottom, top = self.mplPlot.get_ylim()
+        if np.nanmin(y) < bottom or np.nanmax(y) > top:
+            self.mplPlot.relim()
+            self.mplPlot.autoscale_view(scalex=False)
+
+    def updateTrace(self, line, y, draw=True):
+        ''' Replaces the amplitudes of line and redraws only the animated
+            lines over the cached background. The whole figure is drawn
+            when there is no background yet or the axis range changed.
+            Pass draw=False to update several lines before one redraw.
+        '''
+        if not line.get_animated():
+            line.set_animated(True)
+            self.background = None
+        self.setLineData(line, y=y)
+        self.fitY(self.traces[line][1])
+        if draw:
+            self.drawTraces()
+
+    def drawTraces(self):
+        if self.background is None or self.limits() != self.backgroundLimits:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        for line in self.animatedLines():
+            self.mplPlot.draw_artist(line)
+        self.canvas.blit(self.figure.bbox)
+
     def graph(self, x, y, label, xLabel=None, yLabel=None):
         line, = self.mplPlot.plot(x, y, label=label)
+        self.setLineData(line, x, y)
         self.setAxisLabels(x=xLabel, y=yLabel)
         self.drawPlot()
         return line
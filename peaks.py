@@ -0,0 +1,41 @@
+'''
+Vectorized peak lookup around golden frequencies
+'''
+import numpy as np
+
+
+def findWindowPeaks(frequency, amplitude, targets, window=0):
+    ''' Returns the trace index of the largest amplitude within +/- window
+        of each target frequency, or of the nearest bin when the window
+        holds none. frequency must be sorted ascending; NaN amplitudes are
+        ignored unless the whole window is NaN.
+        Example usage:
+            index = findWindowPeaks(trace[xcol], trace[corrected], [100, 200], 0.5)
+    '''
+    frequency = np.asarray(frequency, dtype=float)
+    amplitude = np.asarray(amplitude, dtype=float)
+    targets = np.atleast_1d(np.asarray(targets, dtype=float))
+    if targets.size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    last = frequency.size - 1
+    lo = np.searchsorted(frequency, targets - window, side='left')
+    hi = np.searchsorted(frequency, targets + window, side='right')
+
+    # Nearest bin for windows narrower than the bin spacing
+    right = np.clip(np.searchsorted(frequency, targets), 0, last)
+    left = np.clip(right - 1, 0, last)
+    nearest = np.where(np.abs(frequency[left] - targets) <= np.abs(frequency[right] - targets), left, right)
+    empty = hi <= lo
+    lo = np.where(empty, nearest, lo)
+    hi = np.where(empty, nearest + 1, hi)
+
+    # One row of candidate bins per target, padded to the widest window
+    width = int((hi - lo).max())
+    index = lo[:, None] + np.arange(width)
+    valid = index < hi[:, None]
+    index = np.minimum(index, last)
+    values = amplitude[index]
+    values[~valid | np.isnan(values)] = -np.inf
+    best = values.argmax(axis=1)
+    return index[np.arange(targets.size), best]
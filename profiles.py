@@ -0,0 +1,104 @@
+'''
+Declarative analyzer setups for each frequency range
+A profile lists the settings a range needs. Applying it compares them with
+the analyzer's mirrored state (drivers.BaseInstrument.state) and only sends
+the settings that differ. While the mirror does not hold them, e.g. after
+connecting, the analyzer is preset first so settings the profile does not
+list (detectors, attenuation, reference level) are back to their defaults.
+'''
+import drivers
+
+
+def upper(response):
+    return response.strip().strip('"').upper()
+
+
+class ScanProfile:
+    def __init__(self, start, stop, rbw, vbw, points=30000, mode='SAN',
+            traceModes=None, detectors=None, inputChannel=1):
+        ''' Frequencies are (value, units) pairs, e.g. (30, 'MHz')
+            traceModes and detectors map trace number to mode
+        '''
+        self.start = start
+        self.stop = stop
+        self.rbw = rbw
+        self.vbw = vbw
+        self.points = points
+        self.mode = mode
+        self.traceModes = traceModes or {1: 'MAXH', 2: 'WRIT'}
+        self.detectors = detectors or {}
+        self.inputChannel = inputChannel
+
+    def settings(self, sa):
+        ''' Returns (mirror key, desired value, read back conversion, setter)
+            in the order they are sent
+        '''
+        settings = [
+            ('INST', self.mode.upper(), upper, lambda: sa.instrumentMode(self.mode)),
+            ('INP:TYPE', f'INPUT{self.inputChannel}', upper, lambda: sa.rfInput(self.inputChannel)),
+            ('SWE:POIN', self.points, int, lambda: sa.setSweepPoints(self.points)),
+            ('SENS:FREQ:STAR', drivers.toHz(*self.start), float, lambda: sa.setFrequencyStart(*self.start)),
+            ('SENS:FREQ:STOP', drivers.toHz(*self.stop), float, lambda: sa.setFrequencyStop(*self.stop)),
+            ('BAND', drivers.toHz(*self.rbw), float, lambda: sa.setRbw(*self.rbw)),
+            ('BAND:VID', drivers.toHz(*self.vbw), float, lambda: sa.setVbw(*self.vbw)),
+        ]
+        for trace, mode in self.detectors.items():
+            settings.append((f'DET{trace}', mode.upper(), upper,
+                lambda trace=trace, mode=mode: sa.setDetector(trace, mode)))
+        return settings
+
+    def diff(self, sa):
+        ''' Returns the settings whose last known value differs from the
+            profile. Settings missing from the mirror are read back first.
+        '''
+        changes = []
+        for key, desired, convert, setter in self.settings(sa):
+            try:
+                current = sa.getSetting(key, convert)
+            except Exception:
+                current = None
+            if not drivers.settingMatches(desired, current):
+                changes.append((key, desired, convert, setter))
+        if changes and changes[0][0] == 'INST':
+            # Changing the mode forgets the mirror, send everything
+            return self.settings(sa)
+        return changes
+
+    def isCold(self, sa):
+        ''' True while any setting of the profile is missing from the mirror,
+            so the analyzer may have been changed from its front panel
+        '''
+        return any(key not in sa.state for key, *rest in self.settings(sa))
+
+    def apply(self, sa, force=False, verify=False):
+        ''' Sends only the settings that differ from the analyzer's state.
+            Presets and sends everything with force or a cold mirror. Trace
+            modes are always sent so max hold traces restart. Returns the
+            keys that were changed.
+        '''
+        with sa.batch(verify=verify):
+            if force or self.isCold(sa):
+                sa.preset()
+                changes = self.settings(sa)
+            else:
+                changes = self.diff(sa)
+            for key, desired, convert, setter in changes:
+                setter()
+            for trace, mode in self.traceModes.items():
+                sa.setTraceMode(trace, mode)
+        return [change[0] for change in changes]
+
+
+RE_LF = ScanProfile(start=(30, 'MHz'), stop=(1, 'GHz'), rbw=(120, 'kHz'), vbw=(300, 'kHz'))
+RE_MF = ScanProfile(start=(1, 'GHz'), stop=(18, 'GHz'), rbw=(1, 'MHz'), vbw=(3, 'MHz'))
+RE_HF = ScanProfile(start=(18, 'GHz'), stop=(40, 'GHz'), rbw=(1, 'MHz'), vbw=(3, 'MHz'))
+CE = ScanProfile(start=(150, 'kHz'), stop=(30, 'MHz'), rbw=(9, 'kHz'), vbw=(9, 'kHz'), inputChannel=2)
+
+PROFILES = {
+    'lf': RE_LF,
+    'mf': RE_MF,
+    'hf': RE_HF,
+    'L': CE,
+    'N': CE,
+    'S': CE,
+}
@@ -0,0 +1,159 @@
+'''
+Recording of raw analyzer traces during a confidence check
+A session is two files side by side:
+    <name>.f32  -> memory mapped float32 rows, one per frame
+    <name>.json -> range, start time, frequency axis and frame count
+Every row holds the seconds since the session started, the tower and
+turntable positions, then the raw amplitude of each trace, so all rows
+have the same width of 3 + traces * points.
+'''
+from pathlib import Path
+import json
+import time
+
+import numpy as np
+
+HEADER = ('time', 'tower', 'turntable')
+
+
+def sessionPaths(path):
+    path = Path(path)
+    return path.with_suffix('.f32'), path.with_suffix('.json')
+
+
+def pruneSessions(directory, keep=None, maxBytes=None):
+    ''' Deletes the oldest sessions in directory until at most keep remain
+        and together they take at most maxBytes. Once a session does not fit,
+        it and every older session are deleted. Returns the removed paths.
+    '''
+    infoPaths = sorted(Path(directory).glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+    kept = total = 0
+    full = False
+    removed = []
+    for infoPath in infoPaths:
+        paths = sessionPaths(infoPath)
+        size = sum(p.stat().st_size for p in paths if p.exists())
+        full = full or (keep is not None and kept >= keep) or (maxBytes is not None and total + size > maxBytes)
+        if not full:
+            kept += 1
+            total += size
+            continue
+        for p in paths:
+            p.unlink(missing_ok=True)
+        removed.append(paths[0])
+    return removed
+
+
+class SessionRecorder:
+    # Most frames added to the file each time it fills up, it doubles below
+    growFrames = 1024
+    # Frame count is written to the json this often
+    syncFrames = 64
+
+    def __init__(self, path, frequency, traces=2, capacity=1024, **info):
+        ''' frequency -> sweep frequency axis shared by every frame
+            info -> extra fields stored in the json, e.g. fRange
+        '''
+        self.path, self.infoPath = sessionPaths(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.frequency = np.asarray(frequency, dtype=float)
+        self.points = len(self.frequency)
+        self.traces = traces
+        self.width = len(HEADER) + traces * self.points
+        self.start = time.time()
+        self.info = info
+        self.count = 0
+        self.rows = None
+        self.path.write_bytes(b'')
+        self.allocate(capacity)
+        self.writeInfo()
+
+    def allocate(self, capacity):
+        # Grow the file in place and map all of it, earlier frames stay on disk
+        if self.rows is not None:
+            self.rows.flush()
+            del self.rows
+        with open(self.path, 'r+b') as f:
+            f.truncate(capacity * self.width * np.dtype(np.float32).itemsize)
+        self.rows = np.memmap(self.path, dtype=np.float32, mode='r+', shape=(capacity, self.width))
+        self.capacity = capacity
+
+    def record(self, *traces, tower=np.nan, turntable=np.nan, timestamp=None):
+        ''' Copies one frame of raw amplitude arrays into the next row.
+            Returns the number of frames recorded.
+        '''
+        if len(traces) != self.traces:
+            raise ValueError(f'Expected {self.traces} traces, got {len(traces)}')
+        if self.count == self.capacity:
+            self.allocate(self.capacity + min(max(self.capacity, 1), self.growFrames))
+        row = self.rows[self.count]
+        row[0] = (time.time() if timestamp is None else timestamp) - self.start
+        row[1] = tower
+        row[2] = turntable
+        start = len(HEADER)
+        for trace in traces:
+            row[start:start + self.points] = trace
+            start += self.points
+        self.count += 1
+        if self.count % self.syncFrames == 0:
+            self.writeInfo()
+        return self.count
+
+    def writeInfo(self):
+        info = dict(self.info,
+            start=self.start,
+            count=self.count,
+            traces=self.traces,
+            points=self.points,
+            frequency=self.frequency.tolist())
+        self.infoPath.write_text(json.dumps(info))
+
+    def close(self):
+        ''' Trims the unused rows and writes the final frame count '''
+        if self.rows is None:
+            return
+        self.rows.flush()
+        del self.rows
+        self.rows = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(self.count * self.width * np.dtype(np.float32).itemsize)
+        self.writeInfo()
+
+
+class RecordedSession:
+    ''' Read only view of a recorded session, frames are read from disk
+        as they are indexed
+    '''
+    def __init__(self, path):
+        self.path, self.infoPath = sessionPaths(path)
+        self.info = json.loads(self.infoPath.read_text())
+        self.frequency = np.array(self.info['frequency'], dtype=float)
+        self.points = self.info['points']
+        self.traces = self.info['traces']
+        self.start = self.info['start']
+        self.count = self.info['count']
+        width = len(HEADER) + self.traces * self.points
+        if self.count:
+            self.rows = np.memmap(self.path, dtype=np.float32, mode='r', shape=(self.count, width))
+        else:
+            self.rows = np.empty((0, width), dtype=np.float32)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def time(self):
+        return self.rows[:, 0]
+
+    @property
+    def tower(self):
+        return self.rows[:, 1]
+
+    @property
+    def turntable(self):
+        return self.rows[:, 2]
+
+    def trace(self, frame, num_trace=1):
+        ''' Raw amplitudes of trace num_trace (1 based) in frame '''
+        start = len(HEADER) + (num_trace - 1) * self.points
+        return self.rows[frame, start:start + self.points]
@@ -0,0 +1,92 @@
+'''
+Offline replay of recorded sessions (see recorder.py)
+ReplayAnalyzer stands in for drivers.ESW so a ConfidenceCheck runs its
+correction, peak search and pass/fail check on recorded frames without
+an analyzer. Frames are served as fast as they are asked for.
+Example usage:
+    python replay.py sessions/lf_20200101_120000.json results.db
+'''
+import sys
+import time
+
+import pandas as pd
+
+import constants
+from recorder import RecordedSession
+
+
+class ReplayAnalyzer:
+    xcol = constants.XCOL
+    ycol = constants.YCOL
+
+    def __init__(self, session, loop=False):
+        ''' session -> RecordedSession or path of one
+            loop -> start again after the last frame instead of raising EOFError
+        '''
+        if not isinstance(session, RecordedSession):
+            session = RecordedSession(session)
+        if not len(session):
+            raise ValueError(f'{session.path} holds no frames')
+        self.session = session
+        self.loop = loop
+        self.frame = 0
+
+    def __str__(self):
+        return f'Replay of {self.session.path.name}, {len(self.session)} frames'
+
+    def establishConnection(self):
+        self.frame = 0
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def waitSweep(self):
+        ''' Moves to the next recorded frame '''
+        if self.frame + 1 < len(self.session):
+            self.frame += 1
+        elif self.loop:
+            self.frame = 0
+        else:
+            raise EOFError('End of recorded session')
+        return 0.0
+
+    def readTrace(self, n, delay=None):
+        ''' Returns trace n of the current frame like drivers.ESW.readTrace '''
+        return pd.DataFrame(data={
+            self.xcol: self.session.frequency,
+            self.ycol: self.session.trace(self.frame, n),
+        })
+
+
+def replaySession(cc, session):
+    ''' Checks the last frame of session, the final max hold trace, against
+        the golden values with cc's current correction factors.
+        Returns (results frame, passed).
+    '''
+    analyzer = ReplayAnalyzer(session)
+    live = cc.instruments.sa
+    cc.instruments.sa = analyzer
+    try:
+        analyzer.frame = len(analyzer.session) - 1
+        cc.findPeaks()
+        results = cc.getResultsFrame()
+        return results, cc.checkPass()
+    finally:
+        cc.instruments.sa = live
+
+
+if __name__ == '__main__':
+    from ccModel import ConfidenceCheck
+
+    session = RecordedSession(sys.argv[1])
+    # Results file given on the command line, the default one otherwise
+    kwargs = {'filepath': sys.argv[2]} if len(sys.argv) > 2 else {}
+    cc = ConfidenceCheck(fRange=session.info['fRange'], **kwargs)
+    start = time.perf_counter()
+    results, passed = replaySession(cc, session)
+    elapsed = time.perf_counter() - start
+    print(results)
+    print(f'{"Passed" if passed else "Failed"}, {len(session)} frames in {elapsed:.3f} s')
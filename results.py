@@ -0,0 +1,341 @@
+'''
+Storage backends for golden values and confidence check results
+The backend is picked from the configured results file:
+    .xlsx/.xlsm/.xls -> Excel workbook through xlwings (Windows, Excel running)
+    .db/.sqlite      -> SQLite database
+    directory        -> CSV files, one golden and one results file per range
+SQLite files and CSV directories are created on first use. Golden values
+are copied from a workbook with copyGoldenValues, e.g.
+    python results.py "Daily Confidence Checks.xlsx" checks.db
+Golden values cannot be copied into a workbook, they are entered in Excel.
+'''
+from abc import ABC, abstractmethod
+from pathlib import Path
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import constants
+
+try:
+    import xlwings as xw
+except ImportError:
+    xw = None
+
+EXCEL_SUFFIXES = ('.xlsx', '.xlsm', '.xls')
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+class GoldenValuesMissing(LookupError):
+    '''No golden values are stored for a range'''
+
+
+def canCreate(path):
+    ''' True when path names a SQLite file or CSV directory that openResults
+        may create, i.e. its parent directory exists
+    '''
+    path = Path(path)
+    return (path.suffix.lower() in SQLITE_SUFFIXES or path.suffix == '') and path.parent.is_dir()
+
+
+def floatArray(values):
+    return np.atleast_1d(np.array(values, dtype=float))
+
+
+class ResultsStore(ABC):
+    '''Golden values and results for every range, read and written in bulk'''
+    xcol = constants.XCOL
+    corrected = constants.CORRECTED
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def changedTime(self, fRange):
+        ''' Changes whenever the golden values of fRange may have changed '''
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    @abstractmethod
+    def goldenValues(self, fRange):
+        ''' Returns (frequencies, values) arrays, raises GoldenValuesMissing
+            when none are stored for fRange
+        '''
+
+    @abstractmethod
+    def saveResults(self, fRange, user, frequencies, golden, measured, deltas):
+        ''' Stores one run of measured peaks and their deltas '''
+
+    @abstractmethod
+    def clearResults(self, fRange):
+        ''' Removes the latest run of fRange '''
+
+    def save(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ExcelResults(ResultsStore):
+    '''Daily confidence check workbook, one sheet and two tables per range.
+       Excel is started and the workbook opened on first use.
+    '''
+    def __init__(self, path, sheets):
+        if xw is None:
+            raise ImportError('xlwings is required to store results in Excel')
+        super().__init__(path)
+        self.sheets = sheets
+        self._app = None
+        self._wb = None
+
+    @property
+    def wb(self):
+        if self._wb is None:
+            self._app = xw.App(visible=True)
+            self._wb = xw.Book(str(self.path))
+        return self._wb
+
+    @property
+    def app(self):
+        self.wb
+        return self._app
+
+    @property
+    def isOpen(self):
+        return self._wb is not None
+
+    def sheet(self, fRange):
+        return self.wb.sheets[self.sheets[fRange]]
+
+    def goldenValues(self, fRange):
+        try:
+            table = self.sheet(fRange).range(f'Measured_{fRange}')
+        except Exception as e:
+            # Missing sheets and tables surface as COM errors
+            raise GoldenValuesMissing(f'No Measured_{fRange} table in {self.path}') from e
+        return floatArray(table[:,0].value), floatArray(table[:,1].value)
+
+    def saveResults(self, fRange, user, frequencies, golden, measured, deltas):
+        ws = self.sheet(fRange)
+        measuredTable = f'Measured_{fRange}'
+        deltaTable = f'Deltas_{fRange}'
+        measCol = ws.range(measuredTable)[:,3]
+        deltaCol = ws.range(deltaTable)[:,0]
+
+        # Store equations
+        average = ws.range(f'{measuredTable}[Average]')
+        averageFormula = average.formula
+        deltaFormula = deltaCol.formula
+
+        # Insert empty columns
+        if sys.platform == 'win32':
+            ws.api.ListObjects(measuredTable).ListColumns.add(4)
+            ws.api.ListObjects(deltaTable).ListColumns.add(1)
+        else:
+            measCol.api.insert_into_range()
+            deltaCol.api.insert_into_range()
+
+        # Repopulate columns with stored equations
+        average.value = averageFormula
+        ws.range(deltaTable)[:,0].value = deltaFormula
+
+        # Enter user and date
+        date = time.strftime('%x', time.localtime())
+        ws.range('D9').value = f'{user} - {date}'
+
+        # Reshape array to column vector and update the excel sheet
+        measCol.value = np.asarray(measured).reshape(-1,1)
+
+    def clearResults(self, fRange):
+        # Clear the measurements column
+        self.sheet(fRange).range(f'Measured_{fRange}')[:,3].clear_contents()
+
+    def save(self):
+        if self.isOpen:
+            self.wb.save(str(self.path))
+
+    def close(self):
+        if self.isOpen:
+            self._wb.close()
+            self._app.quit()
+            self._wb = self._app = None
+
+
+class SqliteResults(ResultsStore):
+    schema = '''
+        CREATE TABLE IF NOT EXISTS golden (
+            range TEXT, position INTEGER, frequency REAL, value REAL,
+            PRIMARY KEY (range, position));
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, range TEXT, user TEXT, date TEXT);
+        CREATE TABLE IF NOT EXISTS results (
+            run INTEGER REFERENCES runs(id) ON DELETE CASCADE, position INTEGER,
+            frequency REAL, golden REAL, measured REAL, delta REAL);
+    '''
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(self.schema)
+
+    def goldenValues(self, fRange):
+        rows = self.db.execute(
+            'SELECT frequency, value FROM golden WHERE range = ? ORDER BY position',
+            (fRange,)).fetchall()
+        if not rows:
+            raise GoldenValuesMissing(f'No golden values stored for {fRange} in {self.path}')
+        values = np.array(rows, dtype=float).reshape(-1, 2)
+        return values[:,0].copy(), values[:,1].copy()
+
+    def setGoldenValues(self, fRange, frequencies, values):
+        with self.db:
+            self.db.execute('DELETE FROM golden WHERE range = ?', (fRange,))
+            self.db.executemany('INSERT INTO golden VALUES (?, ?, ?, ?)',
+                [(fRange, i, float(f), float(v)) for i, (f, v) in enumerate(zip(frequencies, values))])
+
+    def saveResults(self, fRange, user, frequencies, golden, measured, deltas):
+        date = time.strftime('%x', time.localtime())
+        with self.db:
+            run = self.db.execute('INSERT INTO runs (range, user, date) VALUES (?, ?, ?)',
+                (fRange, user, date)).lastrowid
+            self.db.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                [(run, i, *map(float, row)) for i, row in enumerate(zip(frequencies, golden, measured, deltas))])
+        return run
+
+    def getResults(self, fRange):
+        ''' Returns every stored run of fRange as a DataFrame '''
+        return pd.read_sql_query(
+            'SELECT runs.id AS run, user, date, frequency, golden, measured, delta '
+            'FROM results JOIN runs ON results.run = runs.id '
+            'WHERE range = ? ORDER BY runs.id, position', self.db, params=(fRange,))
+
+    def clearResults(self, fRange):
+        with self.db:
+            self.db.execute('DELETE FROM runs WHERE id = '
+                '(SELECT MAX(id) FROM runs WHERE range = ?)', (fRange,))
+
+    def save(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+class CsvResults(ResultsStore):
+    '''golden_<range>.csv and results_<range>.csv in a directory'''
+    def goldenPath(self, fRange):
+        return self.path / f'golden_{fRange}.csv'
+
+    def resultsPath(self, fRange):
+        return self.path / f'results_{fRange}.csv'
+
+    def changedTime(self, fRange):
+        try:
+            return self.goldenPath(fRange).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def goldenValues(self, fRange):
+        try:
+            golden = pd.read_csv(self.goldenPath(fRange), dtype=float)
+        except FileNotFoundError:
+            raise GoldenValuesMissing(f'No golden values stored for {fRange} in {self.path}') from None
+        if golden.empty:
+            raise GoldenValuesMissing(f'No golden values stored for {fRange} in {self.path}')
+        return golden[self.xcol].to_numpy(), golden[self.corrected].to_numpy()
+
+    def setGoldenValues(self, fRange, frequencies, values):
+        self.path.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame({self.xcol: frequencies, self.corrected: values}).to_csv(
+            self.goldenPath(fRange), index=False)
+
+    def getResults(self, fRange):
+        try:
+            return pd.read_csv(self.resultsPath(fRange))
+        except FileNotFoundError:
+            return pd.DataFrame(columns=['run', 'user', 'date', 'frequency', 'golden', 'measured', 'delta'])
+
+    def saveResults(self, fRange, user, frequencies, golden, measured, deltas):
+        previous = self.getResults(fRange)
+        run = int(previous['run'].max()) + 1 if len(previous) else 1
+        rows = pd.DataFrame({
+            'run': run,
+            'user': user,
+            'date': time.strftime('%x', time.localtime()),
+            'frequency': frequencies,
+            'golden': golden,
+            'measured': measured,
+            'delta': deltas,
+        })
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self.resultsPath(fRange)
+        rows.to_csv(path, mode='a', header=not path.exists(), index=False)
+        return run
+
+    def clearResults(self, fRange):
+        previous = self.getResults(fRange)
+        if len(previous):
+            previous = previous[previous['run'] != previous['run'].max()]
+            previous.to_csv(self.resultsPath(fRange), index=False)
+
+
+def openResults(path, sheets=None):
+    ''' Returns the backend matching the configured results path '''
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in EXCEL_SUFFIXES:
+        return ExcelResults(path, sheets)
+    if suffix in SQLITE_SUFFIXES:
+        return SqliteResults(path)
+    if suffix == '':
+        return CsvResults(path)
+    raise ValueError(f'No results backend for {path}')
+
+
+def copyGoldenValues(source, target, fRanges):
+    ''' Copies the golden values of every range in fRanges stored in source
+        to target, e.g. from an ExcelResults to a SqliteResults. Returns the
+        ranges copied; ranges source has none for are skipped.
+    '''
+    if isinstance(target, ExcelResults):
+        raise ValueError('Golden values cannot be copied into an Excel workbook, '
+            'use a SQLite file or CSV directory')
+    copied = []
+    for fRange in fRanges:
+        try:
+            frequencies, values = source.goldenValues(fRange)
+        except GoldenValuesMissing:
+            continue
+        target.setGoldenValues(fRange, frequencies, values)
+        copied.append(fRange)
+    target.save()
+    return copied
+
+
+if __name__ == '__main__':
+    import argparse
+    from ccModel import ConfidenceCheck
+
+    parser = argparse.ArgumentParser(description='Copy golden values between results stores')
+    parser.add_argument('source', type=Path, help='workbook, SQLite file or CSV directory')
+    parser.add_argument('target', type=Path, help='SQLite file or CSV directory, created if needed')
+    parser.add_argument('--ranges', nargs='+', default=list(ConfidenceCheck.fRanges))
+    args = parser.parse_args()
+    if args.target.suffix.lower() in EXCEL_SUFFIXES:
+        parser.error('target must be a SQLite file or CSV directory, not an Excel workbook')
+
+    source = openResults(args.source, ConfidenceCheck.fRanges)
+    target = openResults(args.target, ConfidenceCheck.fRanges)
+    try:
+        copied = copyGoldenValues(source, target, args.ranges)
+    finally:
+        target.close()
+        source.close()
+    print(f'Copied golden values of {", ".join(copied) or "no ranges"} to {args.target}')
@@ -0,0 +1,49 @@
+'''
+Fixed size ring of trace frames shared between an acquisition thread and the plot
+'''
+import threading
+
+import numpy as np
+
+
+class FrameRing:
+    def __init__(self, size=4, traces=2):
+        ''' size -> frames kept
+            traces -> amplitude arrays per frame
+        '''
+        self.size = size
+        self.traces = traces
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.frequency = None
+            self.data = None
+            self.count = 0
+
+    def push(self, frequency, *traces):
+        ''' Copies one frame into the next slot, reallocating only when the
+            number of points changes
+        '''
+        with self.lock:
+            points = len(frequency)
+            if self.data is None or self.data.shape[2] != points:
+                self.data = np.full((self.size, self.traces, points), np.nan)
+                self.count = 0
+            if self.frequency is None or not np.array_equal(self.frequency, frequency):
+                self.frequency = np.array(frequency, dtype=float)
+            slot = self.data[self.count % self.size]
+            for i, trace in enumerate(traces):
+                slot[i] = trace
+            self.count += 1
+            return self.count
+
+    def latest(self):
+        ''' Returns (frame count, frequency, copy of the newest frame's traces),
+            (0, None, None) before the first frame
+        '''
+        with self.lock:
+            if not self.count:
+                return 0, None, None
+            return self.count, self.frequency, self.data[(self.count - 1) % self.size].copy()
@@ -0,0 +1,151 @@
+'''
+Process wide pool of long lived VISA sessions
+Instruments connecting to the same resource share one handle that stays
+open between frames. A handle checks its session before use and reopens
+it when the session was closed or the connection dropped, then retries
+the call once.
+'''
+import threading
+
+import visa
+
+# Status codes meaning the session has to be opened again
+RECONNECT_CODES = {
+    visa.constants.StatusCode.error_connection_lost,
+    visa.constants.StatusCode.error_invalid_object,
+    visa.constants.StatusCode.error_no_listeners,
+}
+
+
+def isStale(error):
+    if isinstance(error, visa.InvalidSession):
+        return True
+    return isinstance(error, visa.VisaIOError) and error.error_code in RECONNECT_CODES
+
+
+class PooledResource:
+    ''' Long lived handle on one resource. Attributes set on it, e.g.
+        timeout, are set again on every new session. close() leaves the
+        session open for the next user; use SessionPool.close to end it.
+        state is the settings mirror shared by every instrument on the
+        handle, it is emptied whenever a new session is opened.
+    '''
+    def __init__(self, resourceManager, resourceName, **kwargs):
+        object.__setattr__(self, 'resourceManager', resourceManager)
+        object.__setattr__(self, 'resource_name', resourceName)
+        object.__setattr__(self, 'options', dict(kwargs))
+        object.__setattr__(self, 'lock', threading.RLock())
+        object.__setattr__(self, 'reconnects', 0)
+        object.__setattr__(self, 'resource', None)
+        object.__setattr__(self, 'state', {})
+        self.connect()
+
+    def __getattr__(self, attribute):
+        if attribute in ('resource', 'options', 'state'):
+            # Not set yet, e.g. while unpickling
+            raise AttributeError(attribute)
+        return getattr(self.ensureOpen(), attribute)
+
+    def __setattr__(self, attribute, value):
+        if hasattr(type(self), attribute):
+            # Replacing one of the handle's own methods
+            object.__setattr__(self, attribute, value)
+            return
+        self.options[attribute] = value
+        setattr(self.ensureOpen(), attribute, value)
+
+    def connect(self):
+        with self.lock:
+            self.release()
+            resource = self.resourceManager.open_resource(self.resource_name)
+            for attribute, value in self.options.items():
+                setattr(resource, attribute, value)
+            object.__setattr__(self, 'resource', resource)
+            # The instrument may have been preset or changed meanwhile
+            self.state.clear()
+            return resource
+
+    def release(self):
+        with self.lock:
+            if self.resource is not None:
+                try:
+                    self.resource.close()
+                except Exception:
+                    pass
+            object.__setattr__(self, 'resource', None)
+
+    def isAlive(self):
+        ''' True while the session is open, checked without any I/O '''
+        if self.resource is None:
+            return False
+        try:
+            session = self.resource.session
+        except visa.InvalidSession:
+            return False
+        return session is not None and session is not False
+
+    def ensureOpen(self):
+        with self.lock:
+            if not self.isAlive():
+                object.__setattr__(self, 'reconnects', self.reconnects + 1)
+                return self.connect()
+            return self.resource
+
+    def call(self, method, *args, **kwargs):
+        ''' Calls a resource method, reconnecting and retrying once when the
+            session turns out to be stale
+        '''
+        with self.lock:
+            try:
+                return getattr(self.ensureOpen(), method)(*args, **kwargs)
+            except (visa.VisaIOError, visa.InvalidSession) as e:
+                if not isStale(e):
+                    raise
+                object.__setattr__(self, 'reconnects', self.reconnects + 1)
+                return getattr(self.connect(), method)(*args, **kwargs)
+
+    def write(self, *args, **kwargs):
+        return self.call('write', *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        return self.call('read', *args, **kwargs)
+
+    def read_raw(self, *args, **kwargs):
+        return self.call('read_raw', *args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        return self.call('query', *args, **kwargs)
+
+    def query_binary_values(self, *args, **kwargs):
+        return self.call('query_binary_values', *args, **kwargs)
+
+    def open(self):
+        self.ensureOpen()
+
+    def close(self):
+        # The pool owns the session
+        pass
+
+
+class SessionPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handles = {}
+
+    def acquire(self, resourceManager, resourceName):
+        ''' Returns the shared handle of resourceName, opening it if needed '''
+        key = (id(resourceManager), resourceName)
+        with self.lock:
+            handle = self.handles.get(key)
+            if handle is None or handle.resourceManager is not resourceManager:
+                handle = self.handles[key] = PooledResource(resourceManager, resourceName)
+        handle.ensureOpen()
+        return handle
+
+    def close(self, resourceName=None):
+        ''' Closes the sessions of resourceName, or every session '''
+        with self.lock:
+            keys = [key for key in self.handles if resourceName in (None, key[1])]
+            handles = [self.handles.pop(key) for key in keys]
+        for handle in handles:
+            handle.release()
@@ -1,14 +1,26 @@
 from PyQt5 import QtWidgets, QtCore
 from ccSettingsUi import Ui_Settings 
 import drivers
+import profiles
 import shelve
 import constants
 from pathlib import Path
+from results import canCreate
 
 class Instruments:
-    def __init__(self, fRange=''):
+    def __init__(self, fRange='', verify=False, configPath=None):
+        ''' configPath -> directory of the <fRange>Instruments settings,
+                          constants.CONFIG_FP by default
+        '''
+        self.verify = verify
+        self.configPath = configPath
         self.fRange = fRange
 
+    @property
+    def settingsPath(self):
+        configPath = constants.CONFIG_FP if self.configPath is None else self.configPath
+        return str(Path(configPath) / f'{self.fRange}Instruments')
+
     @property
     def fRange(self):
         return self._fRange
@@ -20,7 +32,7 @@ class Instruments:
 
     def recallSettings(self):
         if self.fRange != '':
-            with shelve.open(str(constants.CONFIG_FP / f'{self.fRange}Instruments')) as settings:
+            with shelve.open(self.settingsPath) as settings:
                 try:
                     self.sa = settings['sa']
                     self.ctrl = settings['ctrl']
@@ -30,74 +42,27 @@ class Instruments:
 
     def saveInstruments(self):
         if self.fRange != '':
-            with shelve.open(str(constants.CONFIG_FP / f'{self.fRange}Instruments')) as settings:
+            with shelve.open(self.settingsPath) as settings:
                 settings['sa'] = self.sa
                 settings['ctrl'] = self.ctrl
 
-    def setupReLf(self):
-        self.sa.preset()
-        self.sa.instrumentMode('SAN')
-        self.sa.setSweepPoints(30000)
-        self.sa.setFrequencyStart(30, 'MHz')
-        self.sa.setFrequencyStop(1, 'GHz')
-        self.sa.setRbw(120, 'kHz')
-        self.sa.setVbw(300, 'kHz')
-        self.sa.setTraceMode(1, 'MAXH')
-        self.sa.setTraceMode(2, 'WRIT')
-
-    def setupReMf(self):
-        self.sa.preset()
-        self.sa.instrumentMode('SAN')
-        self.sa.setSweepPoints(30000)
-        self.sa.setFrequencyStart(1, 'GHz')
-        self.sa.setFrequencyStop(18, 'GHz')
-        self.sa.setRbw(1, 'MHz')
-        self.sa.setVbw(3, 'MHz')
-        self.sa.setTraceMode(1, 'MAXH')
-        self.sa.setTraceMode(2, 'WRIT')
-
-    def setupReHf(self):
-        # 18GHz - 40GHz setup
-        self.sa.preset()
-        self.sa.instrumentMode('SAN')
-        self.sa.setSweepPoints(30000)
-        self.sa.setFrequencyStart(18, 'GHz')
-        self.sa.setFrequencyStop(40, 'GHz')
-        self.sa.setRbw(1, 'MHz')
-        self.sa.setVbw(3, 'MHz')
-        self.sa.setTraceMode(1, 'MAXH')
-        self.sa.setTraceMode(2, 'WRIT')
-
-    def setupCe(self):
-        # Conducted Emissions setup
-        self.sa.preset()
-        self.sa.instrumentMode('SAN')
-        self.sa.setSweepPoints(30000)
-        self.sa.setFrequencyStart(150, 'KHz')
-        self.sa.setFrequencyStop(30, 'MHz')
-        self.sa.setRbw(9, 'KHz')
-        self.sa.setVbw(9, 'KHz')
-        self.sa.rfInput(2)
-        self.sa.setTraceMode(1, 'MAXH')
-        self.sa.setTraceMode(2, 'WRIT')
-
-    def setupSaSettings(self):
-        scanType = {
-            'lf': self.setupReLf,
-            'mf': self.setupReMf,
-            'hf': self.setupReHf,
-            'L': self.setupCe,
-            'N': self.setupCe,
-            'S': self.setupCe,
-        }
-        func = scanType.get(self.fRange, 'Make a scan selection.')
-        func()
+    def setupSaSettings(self, force=False):
+        ''' Applies the range's scan profile, sending only the settings that
+            differ from the analyzer's last known state. force presets first.
+        '''
+        profile = profiles.PROFILES.get(self.fRange)
+        if profile is None:
+            return 'Make a scan selection.'
+        return profile.apply(self.sa, force=force, verify=self.verify)
 
 class SettingsView(QtWidgets.QDialog, Ui_Settings):
     def __init__(self, ccFile='', fRange=''):
         super(SettingsView, self).__init__()
         self.setupUi(self)
         self.filepathEdit.setText(str(ccFile))
+        self.browseFolderButton = QtWidgets.QPushButton('Folder...', self.verticalLayoutWidget)
+        self.browseFolderButton.clicked.connect(self.browseFolderSlot)
+        self.fileSettingLayout.addWidget(self.browseFolderButton)
         self.fRange = fRange
         self.appFp = Path(__file__).parent.absolute()
         self.instruments = Instruments(fRange=self.fRange)
@@ -120,16 +85,24 @@ class SettingsView(QtWidgets.QDialog, Ui_Settings):
 
     @QtCore.pyqtSlot()
     def browseSlot(self):
-        options = QtWidgets.QFileDialog.Options()
-        fileName, _ = QtWidgets.QFileDialog.getOpenFileName(
+        # New SQLite files may be named here, they are created on first use
+        options = QtWidgets.QFileDialog.Options(QtWidgets.QFileDialog.DontConfirmOverwrite)
+        fileName, _ = QtWidgets.QFileDialog.getSaveFileName(
                         None,
-                        "QFileDialog.getOpenFileName()",
+                        "Results File",
                         "",
-                        "Excel Files (*.xlsx);;Old Excel Files (*.xlx);;All Files (*)",
+                        "Excel Files (*.xlsx);;Old Excel Files (*.xlx);;SQLite Files (*.db *.sqlite);;All Files (*)",
                         options=options)
         if fileName:
             self.filepathEdit.setText(fileName)
 
+    @QtCore.pyqtSlot()
+    def browseFolderSlot(self):
+        # CSV results directory
+        directory = QtWidgets.QFileDialog.getExistingDirectory(None, "Results Folder")
+        if directory:
+            self.filepathEdit.setText(directory)
+
     @QtCore.pyqtSlot()
     def saIPSelectSlot(self):
         self.saIPRadio.setChecked(True)
@@ -157,7 +130,7 @@ class SettingsView(QtWidgets.QDialog, Ui_Settings):
     def saveSettings(self):
         self.instruments.saveInstruments()
 
-        if Path(self.filepathEdit.text()).exists():
+        if Path(self.filepathEdit.text()).exists() or canCreate(self.filepathEdit.text()):
             with shelve.open(str(self.appFp / 'config' / 'initial')) as f:
                 f['ccFile'] = Path(self.filepathEdit.text())
 
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+'''
+In-process emulation of the ESW receiver and EMCenter controller
+Answers the SCPI commands sent by drivers.py with synthetic spectra and
+tower/turntable motion, delaying every transfer according to a bus profile.
+
+Example usage:
+    import drivers, simulator
+    drivers.setBackend(simulator.SimulatedResourceManager())
+    esw = drivers.ESW(connectionType='GPIB', connectionId=20)
+    esw.establishConnection()
+'''
+import re
+import threading
+import time
+
+import numpy as np
+import visa
+
+
+class BusProfile:
+    '''Per transaction latency (s) and throughput (bytes/s) of a bus'''
+    def __init__(self, latency=0.0, throughput=None):
+        self.latency = latency
+        self.throughput = throughput
+
+    def transferTime(self, nbytes):
+        if self.throughput:
+            return self.latency + nbytes / self.throughput
+        return self.latency
+
+    def transfer(self, nbytes):
+        delay = self.transferTime(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+# Typical figures for an ESW on a GPIB-USB-HS adapter and on gigabit LAN
+BUS_PROFILES = {
+    'GPIB': BusProfile(latency=0.002, throughput=300e3),
+    'TCPIP': BusProfile(latency=0.0005, throughput=10e6),
+}
+
+UNITS = {'HZ': 1, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+
+
+def parseFrequency(text):
+    ''' Converts SCPI frequency text (e.g. "30MHZ", "1.5 GHz", "9000") to Hz '''
+    match = re.fullmatch(r'\s*([-+\d.eE]+)\s*([a-zA-Z]*)\s*', text)
+    if not match:
+        raise ValueError(f'Invalid frequency: {text}')
+    value, unit = match.groups()
+    return float(value) * UNITS.get(unit.upper() or 'HZ', 1)
+
+
+def ieeeBlock(payload):
+    ''' Wraps bytes in an IEEE 488.2 definite length block '''
+    length = str(len(payload))
+    return f'#{len(length)}{length}'.encode('ascii') + payload + b'\n'
+
+
+class SimulatedDevice:
+    '''Command dispatcher shared by all sessions opened on one resource'''
+    idn = 'Simulated,Device,0,0'
+    commands = ()
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.errors = []
+        self._handlers = [(re.compile(pattern, re.IGNORECASE), getattr(self, name))
+            for pattern, name in self.commands]
+
+    def handle(self, command):
+        ''' Executes one program message unit, returns the response or None '''
+        command = command.strip().lstrip(':')
+        if command in ('*IDN?',):
+            return self.idn
+        for pattern, handler in self._handlers:
+            match = pattern.fullmatch(command)
+            if match:
+                with self.lock:
+                    return handler(*match.groups())
+        self.errors.append(command)
+        return None
+
+    def split(self, message):
+        return [c for c in message.split(';') if c.strip()]
+
+
+class SimulatedESW(SimulatedDevice):
+    '''R&S ESW receiver in spectrum analyzer mode with a comb generator at the input'''
+    idn = 'Rohde&Schwarz,ESW26,000000/000,Simulated'
+    commands = (
+        (r'\*RST|SYST:PRES', 'preset'),
+        (r'\*OPC\?', 'opc'),
+        (r'\*OPC|\*WAI|\*CLS', 'ignore'),
+        (r'SYST:DISP:UPD\s+(\w+)', 'ignore'),
+        (r'INST:SEL\s+(\w+)', 'setMode'),
+        (r'INST(?::SEL)?\?', 'getMode'),
+        (r'INIT(\d*):CONT\s+(\w+)', 'setContinuous'),
+        (r'INIT(\d*):CONT\?', 'getContinuous'),
+        (r'INIT(\d*)', 'initiate'),
+        (r'SWE:COUN\s+(\d+)', 'setSweepCount'),
+        (r'SWE:COUN\?', 'getSweepCount'),
+        (r'SWE:TIME\?', 'getSweepTime'),
+        (r'SWE:POIN\s+(\d+)', 'setSweepPoints'),
+        (r'SWE:POIN\?', 'getSweepPoints'),
+        (r'BAND(?::RES)?\s+(.+)', 'setRbw'),
+        (r'BAND(?::RES)?\?', 'getRbw'),
+        (r'BAND:VID\s+(.+)', 'setVbw'),
+        (r'BAND:VID\?', 'getVbw'),
+        (r'(?:SENS:)?FREQ:(CENT|STAR|STOP)\w*\s+(.+)', 'setFrequency'),
+        (r'(?:SENS:)?FREQ:(CENT|STAR|STOP)\w*\?', 'getFrequency'),
+        (r'DISP:TRAC(\d):MODE\s+(\w+)', 'setTraceMode'),
+        (r'DISP:TRAC(\d):MODE\?', 'getTraceMode'),
+        (r'DISP:TRAC(\d):Y:AUTO\s+\w+', 'ignore'),
+        (r'DET(\d)\s+(\w+)', 'setDetector'),
+        (r'DET(\d)\?', 'getDetector'),
+        (r'FORM\s+(.+)', 'setFormat'),
+        (r'FORM\?', 'getFormat'),
+        (r'TRAC:DATA\?\s+TRACE(\d)', 'getTraceData'),
+        (r'(?:SENS1:)?CORR:TRAN:SEL\s+(.+)', 'setTransducer'),
+        (r'(?:SENS1:)?CORR:TRAN:SEL\?', 'getTransducer'),
+        (r'(?:SENS1:)?CORR:TRAN\s+(\w+)', 'ignore'),
+        (r'INP:TYPE\s+INPUT(\d)', 'setInput'),
+        (r'INP:TYPE\?', 'getInput'),
+    )
+
+    def __init__(self, combSpacing=10e6, combLevel=60.0, noiseFloor=10.0, seed=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.combSpacing = combSpacing
+        self.combLevel = combLevel
+        self.noiseFloor = noiseFloor
+        self.rng = np.random.default_rng(seed)
+        self.preset()
+
+    def preset(self):
+        self.mode = 'SAN'
+        self.continuous = True
+        self.sweepCount = 0
+        self.sweepPoints = 1001
+        self.frequency = {'STAR': 9e3, 'STOP': 26.5e9}
+        self.rbw = 3e6
+        self.vbw = 10e6
+        self.traceModes = {1: 'WRIT', 2: 'BLAN', 3: 'BLAN', 4: 'BLAN', 5: 'BLAN', 6: 'BLAN'}
+        self.detectors = {n: 'POS' for n in self.traceModes}
+        self.format = 'ASCII'
+        self.inputChannel = 1
+        self.transducer = ''
+        self.resetTraces()
+
+    def resetTraces(self):
+        self.traces = {}
+        self.sweepStarted = self.clock()
+        self.sweepsPending = 0
+
+    def ignore(self, *args):
+        return None
+
+    # Sweep model
+    @property
+    def sweepTime(self):
+        ''' Auto coupled sweep time of a swept analyzer, k * span / rbw^2 '''
+        span = self.frequency['STOP'] - self.frequency['STAR']
+        return max(2.5 * span / self.rbw ** 2, 1e-3)
+
+    @property
+    def frequencies(self):
+        return np.linspace(self.frequency['STAR'], self.frequency['STOP'], self.sweepPoints)
+
+    def synthesize(self):
+        ''' One sweep of noise floor plus comb harmonics, dBuV '''
+        f = self.frequencies
+        floor = self.noiseFloor + 10 * np.log10(self.rbw / 1e6)
+        spectrum = floor + self.rng.normal(0, 2.0, f.size)
+        harmonic = np.round(f / self.combSpacing) * self.combSpacing
+        valid = harmonic > 0
+        level = self.combLevel - 10 * np.log10(np.maximum(harmonic, self.combSpacing) / self.combSpacing)
+        comb = level - 12 * ((f - harmonic) / max(self.rbw, 1.0)) ** 2
+        return np.where(valid, np.maximum(spectrum, comb), spectrum).astype(np.float32)
+
+    def applySweep(self):
+        sweep = self.synthesize()
+        for n, mode in self.traceModes.items():
+            trace = self.traces.get(n)
+            if trace is None or trace.size != sweep.size or mode.startswith('WRIT'):
+                self.traces[n] = sweep.copy()
+            elif mode.startswith('MAXH'):
+                np.maximum(trace, sweep, out=trace)
+            elif mode.startswith('MINH'):
+                np.minimum(trace, sweep, out=trace)
+            elif mode.startswith('AVER'):
+                trace += (sweep - trace) / 10
+
+    def advance(self):
+        ''' Applies sweeps finished since the last call '''
+        now = self.clock()
+        if self.continuous:
+            finished = int((now - self.sweepStarted) / self.sweepTime)
+            if finished or not self.traces:
+                self.applySweep()
+                self.sweepStarted += finished * self.sweepTime
+        elif self.sweepsPending:
+            finished = min(int((now - self.sweepStarted) / self.sweepTime), self.sweepsPending)
+            for i in range(finished):
+                self.applySweep()
+            self.sweepStarted += finished * self.sweepTime
+            self.sweepsPending -= finished
+        if not self.traces:
+            self.applySweep()
+
+    def pendingTime(self):
+        ''' Seconds until the running single sweep sequence completes '''
+        if self.continuous or not self.sweepsPending:
+            return 0.0
+        return max(self.sweepStarted + self.sweepsPending * self.sweepTime - self.clock(), 0.0)
+
+    # Command handlers
+    def opc(self):
+        wait = self.pendingTime()
+        if wait:
+            time.sleep(wait)
+        self.advance()
+        return '1'
+
+    def setMode(self, mode):
+        self.mode = mode.upper()
+
+    def getMode(self):
+        return self.mode
+
+    def getContinuous(self, n):
+        # Booleans read back as 1 and 0 like on the instrument
+        return '1' if self.continuous else '0'
+
+    def setContinuous(self, n, state):
+        self.continuous = state.upper() in ('ON', '1')
+        self.resetTraces()
+
+    def initiate(self, n):
+        self.resetTraces()
+        if not self.continuous:
+            self.sweepsPending = max(self.sweepCount, 1)
+
+    def setSweepCount(self, count):
+        self.sweepCount = int(count)
+
+    def getSweepCount(self):
+        return str(self.sweepCount)
+
+    def getSweepTime(self):
+        return f'{self.sweepTime:.6g}'
+
+    def setSweepPoints(self, points):
+        self.sweepPoints = int(points)
+        self.resetTraces()
+
+    def getSweepPoints(self):
+        return str(self.sweepPoints)
+
+    def setRbw(self, value):
+        self.rbw = parseFrequency(value)
+
+    def getRbw(self):
+        return f'{self.rbw:.0f}'
+
+    def setVbw(self, value):
+        self.vbw = parseFrequency(value)
+
+    def getVbw(self):
+        return f'{self.vbw:.0f}'
+
+    def setFrequency(self, which, value):
+        value = parseFrequency(value)
+        if which.upper() == 'CENT':
+            half = (self.frequency['STOP'] - self.frequency['STAR']) / 2
+            self.frequency = {'STAR': value - half, 'STOP': value + half}
+        else:
+            self.frequency[which.upper()] = value
+        self.resetTraces()
+
+    def getFrequency(self, which):
+        if which.upper() == 'CENT':
+            return f'{(self.frequency["STAR"] + self.frequency["STOP"]) / 2:.0f}'
+        return f'{self.frequency[which.upper()]:.0f}'
+
+    def setTraceMode(self, n, mode):
+        self.traceModes[int(n)] = mode.upper()
+        self.traces.pop(int(n), None)
+
+    def getTraceMode(self, n):
+        return self.traceModes[int(n)]
+
+    def setDetector(self, n, mode):
+        self.detectors[int(n)] = mode.upper()
+
+    def getDetector(self, n):
+        return self.detectors[int(n)]
+
+    def setFormat(self, fmt):
+        fmt = fmt.replace(' ', '').upper()
+        self.format = 'REAL,32' if fmt.startswith('REAL') else 'ASCII'
+
+    def getFormat(self):
+        return self.format
+
+    def setInput(self, n):
+        self.inputChannel = int(n)
+
+    def getInput(self):
+        return f'INPUT{self.inputChannel}'
+
+    def setTransducer(self, name):
+        self.transducer = name.strip('"')
+
+    def getTransducer(self):
+        return f'"{self.transducer}"'
+
+    def getTraceData(self, n):
+        self.advance()
+        if int(n) not in self.traces:
+            self.applySweep()
+        data = self.traces[int(n)]
+        if self.format == 'ASCII':
+            return ','.join(f'{v:.2f}' for v in data)
+        return ieeeBlock(data.astype('<f4').tobytes())
+
+
+class Axis:
+    '''Tower or turntable with a trapezoidal velocity profile'''
+    def __init__(self, position, limits, unitsPerSpeed, clock):
+        self.clock = clock
+        self.limits = limits
+        self.unitsPerSpeed = unitsPerSpeed
+        self.speed = 3
+        self.acceleration = 1.0
+        self.start = self.target = position
+        self.started = clock()
+
+    @property
+    def velocity(self):
+        return self.speed * self.unitsPerSpeed
+
+    def duration(self, distance):
+        v, acc = self.velocity, max(self.acceleration, 1e-6)
+        if distance >= v * acc:
+            return distance / v + acc
+        return 2 * np.sqrt(distance * acc / v)
+
+    def travelled(self, t, distance):
+        v, acc = self.velocity, max(self.acceleration, 1e-6)
+        a = v / acc
+        total = self.duration(distance)
+        if t >= total:
+            return distance
+        ramp = acc if distance >= v * acc else total / 2
+        if t < ramp:
+            return a * t ** 2 / 2
+        if t < total - ramp:
+            return v * acc / 2 + v * (t - acc)
+        return distance - a * (total - t) ** 2 / 2
+
+    def position(self):
+        distance = abs(self.target - self.start)
+        travelled = self.travelled(self.clock() - self.started, distance)
+        return self.start + np.sign(self.target - self.start) * travelled
+
+    def seek(self, target):
+        low, high = self.limits
+        self.start = self.position()
+        self.target = min(max(float(target), low), high)
+        self.started = self.clock()
+
+    def moving(self):
+        return self.position() != self.target
+
+    def direction(self):
+        if not self.moving():
+            return 'N'
+        return 'U' if self.target > self.start else 'D'
+
+
+class SimulatedEMCenter(SimulatedDevice):
+    '''ETS-Lindgren EMCenter with a tower on A and a turntable on B'''
+    idn = 'ETS-Lindgren,EMCenter,000000,Simulated'
+    commands = (
+        (r'1(\w)SK\s*([-\d.]+)', 'seek'),
+        (r'1(\w)S(\d)', 'setSpeed'),
+        (r'1(\w)S\?', 'getSpeed'),
+        (r'1(\w)ACC\s*([\d.]+)', 'setAcceleration'),
+        (r'1(\w)ACC\?', 'getAcceleration'),
+        (r'1(\w)CP\?', 'getPosition'),
+        (r'1(\w)DIR\?', 'getDirection'),
+        (r'1(\w)ERR\?', 'getError'),
+        (r'1AP\?', 'getPolarity'),
+        (r'1AP([VH])', 'setPolarity'),
+        (r'1(\w)\*OPC\?', 'opc'),
+        (r'1(\w)\*(?:CLS|WAI)', 'ignore'),
+        (r'1(\w)ST', 'stop'),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.axes = {
+            'A': Axis(100, (100, 400), 5.0, self.clock),
+            'B': Axis(0, (0, 360), 1.5, self.clock),
+        }
+        self.polarity = 'V'
+
+    def axis(self, device):
+        return self.axes[device.upper()]
+
+    def ignore(self, *args):
+        return None
+
+    def seek(self, device, position):
+        self.axis(device).seek(position)
+
+    def stop(self, device):
+        axis = self.axis(device)
+        axis.start = axis.target = axis.position()
+
+    def setSpeed(self, device, speed):
+        self.axis(device).speed = min(max(int(speed), 1), 8)
+
+    def getSpeed(self, device):
+        return str(self.axis(device).speed)
+
+    def setAcceleration(self, device, seconds):
+        self.axis(device).acceleration = min(max(float(seconds), 0.1), 30.0)
+
+    def getAcceleration(self, device):
+        return f'{self.axis(device).acceleration:.1f}'
+
+    def getPosition(self, device):
+        return f'{self.axis(device).position():.1f}'
+
+    def getDirection(self, device):
+        return self.axis(device).direction()
+
+    def getError(self, device):
+        return '0'
+
+    def getPolarity(self):
+        return '1' if self.polarity == 'H' else '0'
+
+    def setPolarity(self, polarity):
+        self.polarity = polarity.upper()
+
+    def opc(self, device):
+        return '0' if self.axis(device).moving() else '1'
+
+
+class SimulatedResource:
+    '''VISA message based session on a simulated device'''
+    def __init__(self, resourceName, device, bus):
+        self.resource_name = resourceName
+        self.device = device
+        self.bus = bus
+        self.timeout = 2000
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.output = []
+        self.session = True
+
+    def checkSession(self):
+        if not self.session:
+            raise visa.InvalidSession()
+
+    def open(self):
+        self.session = True
+
+    def close(self):
+        self.session = False
+        self.output = []
+
+    def clear(self):
+        self.output = []
+
+    def write(self, message):
+        self.checkSession()
+        self.bus.transfer(len(message) + 1)
+        for command in self.device.split(message):
+            response = self.device.handle(command)
+            if response is not None:
+                if isinstance(response, str):
+                    response = response.encode('ascii') + b'\n'
+                self.output.append(response)
+        return len(message), visa.constants.StatusCode.success
+
+    def read_raw(self, size=None):
+        self.checkSession()
+        if not self.output:
+            raise visa.VisaIOError(visa.constants.StatusCode.error_timeout)
+        data = self.output.pop(0)
+        self.bus.transfer(len(data))
+        return data
+
+    def read(self, termination=None, encoding=None):
+        message = self.read_raw().decode(encoding or 'ascii')
+        termination = termination or self.read_termination
+        if termination and message.endswith(termination):
+            message = message[:-len(termination)]
+        return message
+
+    def query(self, message, delay=None):
+        self.write(message)
+        if delay:
+            time.sleep(delay)
+        return self.read()
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False,
+            container=list, delay=None, header_fmt='ieee', expect_termination=True,
+            data_points=0, chunk_size=None):
+        self.write(message)
+        if delay:
+            time.sleep(delay)
+        block = self.read_raw()
+        digits = int(block[1:2])
+        length = int(block[2:2 + digits])
+        start = 2 + digits
+        dtype = np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+        values = np.frombuffer(block, dtype=dtype, count=length // dtype.itemsize, offset=start)
+        if container in (np.ndarray, np.array):
+            return values
+        return container(values)
+
+
+class SimulatedResourceManager:
+    '''Stands in for visa.ResourceManager, see drivers.setBackend'''
+    def __init__(self, devices=None, profiles=None):
+        if devices is None:
+            devices = {
+                'GPIB::20::INSTR': SimulatedESW(),
+                'GPIB::7::INSTR': SimulatedEMCenter(),
+            }
+        self.devices = devices
+        self.profiles = dict(BUS_PROFILES)
+        if profiles:
+            self.profiles.update(profiles)
+
+    def list_resources(self, query='?*::INSTR'):
+        return tuple(self.devices)
+
+    def open_resource(self, resourceName, **kwargs):
+        device = self.devices.get(resourceName)
+        if device is None:
+            raise visa.VisaIOError(visa.constants.StatusCode.error_resource_not_found)
+        bus = self.profiles.get(resourceName.split('::')[0].upper(), BusProfile())
+        resource = SimulatedResource(resourceName, device, bus)
+        for key, value in kwargs.items():
+            setattr(resource, key, value)
+        return resource
+
+    def close(self):
+        pass
+
+
+if __name__ == '__main__':
+    # Benchmark a low frequency scan cycle on each simulated bus
+    import drivers
+    from settings import Instruments
+    for connectionType, address in (('GPIB', 20), ('TCPIP', '10.0.0.10')):
+        rm = SimulatedResourceManager(devices={
+            f'{connectionType}::{address}::INSTR': SimulatedESW(),
+        })
+        drivers.setBackend(rm)
+        instruments = Instruments()
+        instruments.fRange = 'lf'
+        instruments.sa = drivers.ESW(connectionType=connectionType, connectionId=address)
+        instruments.sa.establishConnection()
+        start = time.perf_counter()
+        instruments.setupSaSettings()
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(5):
+            instruments.sa.readTrace(1)
+        frame = (time.perf_counter() - start) / 5
+        print(f'{connectionType}: setup {setup * 1000:.1f} ms, frame {frame * 1000:.1f} ms')
+    drivers.setBackend(None)
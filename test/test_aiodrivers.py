@@ -0,0 +1,56 @@
+import unittest, asyncio, time, threading
+
+import drivers, simulator, profiles
+from aiodrivers import AsyncEMCenter, AsyncESW
+
+class TestAsyncDrivers(unittest.TestCase):
+    def setUp(self):
+        start = time.monotonic()
+        # Motion runs 50 times faster than real time
+        fastClock = lambda: start + (time.monotonic() - start) * 50
+        drivers.setBackend(simulator.SimulatedResourceManager(devices={
+            'GPIB::20::INSTR': simulator.SimulatedESW(seed=0),
+            'GPIB::21::INSTR': simulator.SimulatedESW(seed=1),
+            'GPIB::7::INSTR': simulator.SimulatedEMCenter(clock=fastClock),
+        }, profiles={'GPIB': simulator.BusProfile(latency=0.01)}))
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def test_overlap_instruments(self):
+        async def scenario():
+            esw = AsyncESW(drivers.ESW(connectionId=20))
+            other = AsyncESW(drivers.ESW(connectionId=21))
+            ctrl = AsyncEMCenter(drivers.EMCenter(connectionId=7))
+            ids = await asyncio.gather(esw.connect(), other.connect(), ctrl.connect())
+            await asyncio.gather(esw.applyProfile(profiles.CE), other.applyProfile(profiles.CE))
+            traces = await asyncio.gather(esw.readTrace(1), other.readTrace(1), ctrl.move(ctrl.tower, 400))
+            return ids, traces
+        ids, (trace, otherTrace, position) = asyncio.run(scenario())
+        self.assertIn('ESW', ids[0])
+        self.assertIn('EMCenter', ids[2])
+        self.assertEqual(len(trace), 30000)
+        self.assertEqual(len(otherTrace), 30000)
+        self.assertEqual(position, 400)
+
+    def test_same_resource_serialized(self):
+        esw = drivers.ESW(connectionId=20)
+        active = []
+        peak = []
+        lock = threading.Lock()
+        query = esw.query
+        def countingQuery(command):
+            with lock:
+                active.append(command)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+            return query(command)
+        esw.query = countingQuery
+        async def scenario():
+            first, second = AsyncESW(esw), AsyncESW(esw)
+            await first.connect()
+            await asyncio.gather(*(instrument.query('*IDN?') for instrument in (first, second) * 4))
+        asyncio.run(scenario())
+        self.assertEqual(max(peak), 1)
@@ -0,0 +1,84 @@
+import unittest, tempfile, shutil, shelve, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import drivers, simulator
+from batchcheck import BatchRunner, Station
+from results import SqliteResults
+
+class TestBatchCheck(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.rm = simulator.SimulatedResourceManager(devices={
+            'GPIB::20::INSTR': simulator.SimulatedESW(seed=0),
+            'GPIB::21::INSTR': simulator.SimulatedESW(seed=1, combLevel=70),
+        }, profiles={'GPIB': simulator.BusProfile()})
+        drivers.setBackend(self.rm)
+        self.resultsPath = self.directory / 'results.db'
+        results = SqliteResults(self.resultsPath)
+        results.setGoldenValues('L', [10, 20], [60, 57])
+        results.close()
+
+    def tearDown(self):
+        drivers.setBackend(None)
+        shutil.rmtree(self.directory)
+
+    def station(self, name, address):
+        configPath = self.directory / name
+        configPath.mkdir()
+        frequency = np.linspace(0.1, 35, 50)
+        pd.DataFrame({0: frequency, 1: np.zeros(50)}).to_csv(configPath / 'lisn.csv', header=False, index=False)
+        with shelve.open(str(configPath / 'LFactors')) as factors:
+            factors['LISN'] = configPath / 'lisn.csv'
+        with shelve.open(str(configPath / 'LInstruments')) as settings:
+            settings['sa'] = drivers.ESW(connectionId=address)
+            settings['ctrl'] = drivers.EMCenter(connectionId=7)
+        return Station(name, configPath)
+
+    def test_report(self):
+        stations = [self.station('Chamber 1', 20), self.station('Chamber 2', 21)]
+        runner = BatchRunner(stations, ['L'], 'tester', self.resultsPath)
+        self.assertEqual(len(runner.jobs()), 2)
+        start = time.monotonic()
+        report = runner.run()
+        elapsed = time.monotonic() - start
+        self.assertEqual(list(report['Station']), ['Chamber 1', 'Chamber 2'])
+        self.assertEqual(list(report['Error']), ['', ''])
+        self.assertEqual(list(report['Passed']), [True, False])
+        self.assertGreater(report['Worst Delta (dB)'][1], 3)
+        self.assertIn('ESW', report['Analyzer'][0])
+        # Both chambers ran at the same time
+        self.assertLess(elapsed, report['Duration (s)'].sum())
+        stored = SqliteResults(self.resultsPath)
+        self.assertEqual(stored.getResults('L')['user'].unique().tolist(), ['tester'])
+        stored.close()
+        # The shared store is not saved as either station's results file
+        self.assertEqual(list(stations[0].configPath.glob('initial*')), [])
+
+    def test_missing_golden_values(self):
+        results = SqliteResults(self.resultsPath)
+        results.setGoldenValues('L', [], [])
+        results.close()
+        report = BatchRunner([self.station('Chamber 1', 20)], ['L'], 'tester', self.resultsPath).run()
+        self.assertFalse(report['Passed'][0])
+        self.assertIn('No golden values', report['Error'][0])
+
+    def test_missing_peak(self):
+        results = SqliteResults(self.resultsPath)
+        results.setGoldenValues('L', [10, 20], [60, np.nan])
+        results.close()
+        report = BatchRunner([self.station('Chamber 1', 20)], ['L'], 'tester', self.resultsPath).run()
+        self.assertFalse(report['Passed'][0])
+        self.assertIn('without a measured peak', report['Error'][0])
+
+    def test_excel_refused(self):
+        report = BatchRunner([self.station('Chamber 1', 20)], ['L'], 'tester', self.directory / 'results.xlsx').run()
+        self.assertFalse(report['Passed'][0])
+        self.assertIn('Excel', report['Error'][0])
+
+    def test_missing_settings(self):
+        report = BatchRunner([Station('Empty', self.directory / 'empty')], ['L'], 'tester').run()
+        self.assertFalse(report['Passed'][0])
+        self.assertIn('No results file', report['Error'][0])
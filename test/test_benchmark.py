@@ -0,0 +1,30 @@
+import unittest
+
+import constants
+from benchmark import Benchmark, compareResults, timeit
+
+class TestBenchmark(unittest.TestCase):
+    def report(self, **medians):
+        return {'results': {case: {'median': median, 'min': median, 'runs': 1}
+            for case, median in medians.items()}}
+
+    def test_timeit(self):
+        result = timeit(lambda: None, repeat=3)
+        self.assertEqual(result['runs'], 3)
+        self.assertLessEqual(result['min'], result['median'])
+
+    def test_regressions(self):
+        baseline = self.report(parse=0.010, peaks=0.002, removed=0.1)
+        current = self.report(parse=0.011, peaks=0.004, added=0.5)
+        regressions = compareResults(current, baseline, threshold=1.25)
+        self.assertEqual([r[0] for r in regressions], ['peaks'])
+        self.assertAlmostEqual(regressions[0][3], 2.0)
+        self.assertEqual(compareResults(current, baseline, threshold=3), [])
+
+    def test_close_restores_config(self):
+        configPath = constants.CONFIG_FP
+        with Benchmark(repeat=1) as benchmark:
+            self.assertEqual(constants.CONFIG_FP, benchmark.directory)
+            benchmark.loadDict()
+        self.assertEqual(constants.CONFIG_FP, configPath)
+        self.assertFalse(benchmark.directory.exists())
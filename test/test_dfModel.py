@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from dfModel import DataFrameModel
+
+app = QApplication.instance() or QApplication([])
+
+class TestDataFrameModel(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'Frequency (MHz)': np.linspace(30, 1000, 2500),
+            'Total': np.arange(2500, 0, -1, dtype=float),
+            'Name': [f'row{i}' for i in range(2500)],
+        })
+        self.df.iloc[5, 1] = np.nan
+        self.model = DataFrameModel(self.df)
+
+    def text(self, row, col):
+        return self.model.data(self.model.index(row, col))
+
+    def test_display_matches_dataframe(self):
+        for row, col in ((0, 0), (5, 1), (999, 2), (300, 1)):
+            self.assertEqual(self.text(row, col), str(self.df.iloc[row, col]))
+        self.assertEqual(self.model.headerData(1, Qt.Horizontal, Qt.DisplayRole), 'Total')
+
+    def test_fetch_more(self):
+        self.assertEqual(self.model.rowCount(), 1000)
+        self.assertTrue(self.model.canFetchMore())
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+        self.assertEqual(self.model.rowCount(), 2500)
+        self.assertEqual(self.text(2499, 2), 'row2499')
+
+    def test_sort(self):
+        self.model.sort(1, Qt.AscendingOrder)
+        self.assertEqual(self.text(0, 1), '1.0')
+        self.assertEqual(self.text(0, 2), 'row2499')
+        self.model.sort(0, Qt.DescendingOrder)
+        self.assertEqual(self.text(0, 2), 'row2499')
+        self.model.sort(2, Qt.AscendingOrder)
+        self.assertEqual(self.text(1, 2), 'row1')
+        self.model.sort(-1)
+        self.assertEqual(self.text(3, 2), 'row3')
+
+    def test_view_keeps_order(self):
+        view = QTableView()
+        view.setModel(self.model)
+        view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        view.setSortingEnabled(True)
+        self.assertEqual(self.text(0, 2), 'row0')
@@ -0,0 +1,70 @@
+import unittest, time
+
+import drivers, simulator
+from drivers import MotionTracker
+
+class TestMotionTracker(unittest.TestCase):
+    def test_first_estimate_from_rest(self):
+        # 300 cm at 15 cm/s with 1 s ramps
+        self.assertAlmostEqual(MotionTracker(400, 15, 1).remaining(0, 100), 21)
+        # Short move never reaches full speed
+        self.assertAlmostEqual(MotionTracker(102, 15, 1).remaining(0, 100), 2 * (2 / 15) ** 0.5)
+
+    def test_observed_velocity(self):
+        tracker = MotionTracker(400, 15, 1)
+        tracker.remaining(0, 100)
+        # Moving four times faster than the nominal speed
+        self.assertAlmostEqual(tracker.remaining(1, 160), 4)
+        # Slower than nominal keeps the earlier nominal estimate
+        self.assertAlmostEqual(tracker.remaining(2, 170), 230 / 15)
+
+    def test_no_target(self):
+        self.assertEqual(MotionTracker(None, 15, 1).remaining(0, 100), 0)
+
+
+class TestWaitMotion(unittest.TestCase):
+    def setUp(self):
+        start = time.monotonic()
+        # Motion runs 20 times faster than real time
+        fastClock = lambda: start + (time.monotonic() - start) * 20
+        self.device = simulator.SimulatedEMCenter(clock=fastClock)
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            devices={'GPIB::7::INSTR': self.device}))
+        self.ctrl = drivers.EMCenter(connectionType='GPIB', connectionId=7)
+        self.ctrl.establishConnection()
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def test_wait_motion(self):
+        self.ctrl.setSpeed(self.ctrl.tower, 8)
+        self.ctrl.setPosition(self.ctrl.tower, 400)
+        positions = []
+        position = self.ctrl.waitMotion(self.ctrl.tower, progress=positions.append)
+        self.assertEqual(position, 400)
+        self.assertFalse(self.device.axes['A'].moving())
+        self.assertEqual(positions[-1], 400)
+        self.assertGreater(len(positions), 1)
+
+    def test_stops_soon_after_arrival(self):
+        axis = self.device.axes['A']
+        self.ctrl.setPosition(self.ctrl.tower, 300)
+        self.ctrl.waitMotion(self.ctrl.tower)
+        # Real seconds between arrival and return
+        late = (axis.clock() - axis.started - axis.duration(200)) / 20
+        self.assertLess(late, 0.1)
+
+    def test_wait_several_devices(self):
+        self.ctrl.setPosition(self.ctrl.tower, 200)
+        self.ctrl.setPosition(self.ctrl.turntable, 90)
+        futures = self.ctrl.waitMotions([self.ctrl.tower, self.ctrl.turntable])
+        self.assertEqual(futures[self.ctrl.tower].result(5), 200)
+        self.assertEqual(futures[self.ctrl.turntable].result(5), 90)
+
+    def test_timeout(self):
+        self.ctrl.setPosition(self.ctrl.tower, 400)
+        with self.assertRaises(TimeoutError):
+            self.ctrl.waitMotion(self.ctrl.tower, timeout=0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest, shelve, tempfile, shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from factors import CorrectionFactors
+
+class TestFactors(unittest.TestCase):
+    fRange = 'test'
+
+    def setUp(self):
+        self.configPath = Path(tempfile.mkdtemp())
+        frequency = np.linspace(25, 1100, 60)
+        antenna = pd.DataFrame({0: frequency, 1: 10 + 10 * np.log10(frequency)})
+        cable = pd.DataFrame({0: frequency[::2], 1: np.linspace(1, 5, 30)})
+        antenna.to_csv(self.configPath / 'antenna.csv', header=False, index=False)
+        cable.to_csv(self.configPath / 'cable.csv', header=False, index=False)
+        with shelve.open(str(self.configPath / f'{self.fRange}Factors')) as factors:
+            factors['Antenna'] = self.configPath / 'antenna.csv'
+            factors['Cable'] = self.configPath / 'cable.csv'
+            factors['Preamp'] = Path()
+
+    def tearDown(self):
+        shutil.rmtree(self.configPath)
+
+    def createFactors(self):
+        return CorrectionFactors(configPath=self.configPath, fRange=self.fRange)
+
+    def test_total(self):
+        factors = self.createFactors()
+        total = factors.cf['antenna'] + factors.cf['cable']
+        np.testing.assert_allclose(factors.cf[factors.total], total)
+
+    def test_correction_interpolated(self):
+        factors = self.createFactors()
+        grid = np.linspace(30, 1000, 30000)
+        correction = factors.getCorrection(grid)
+        expected = np.interp(grid, factors.cf[factors.xcol], factors.cf[factors.total])
+        np.testing.assert_allclose(correction, expected)
+
+    def test_correction_outside_factors(self):
+        factors = self.createFactors()
+        first, last = factors.cf[factors.xcol].iloc[[0, -1]]
+        correction = factors.getCorrection(np.array([first - 3, first - 1, last + 1, last + 3]))
+        self.assertTrue(np.isnan(correction[0]))
+        self.assertFalse(np.isnan(correction[1]))
+        self.assertFalse(np.isnan(correction[2]))
+        self.assertTrue(np.isnan(correction[3]))
+
+    def test_correction_cached(self):
+        factors = self.createFactors()
+        grid = np.linspace(30, 1000, 30000)
+        self.assertIs(factors.getCorrection(grid), factors.getCorrection(grid.copy()))
+        factors.loadDict()
+        self.assertEqual(factors.compiled, {})
+
+    def test_cache_written(self):
+        factors = self.createFactors()
+        self.assertTrue(factors.cachePath.exists())
+
+    def test_cache_reused(self):
+        built = self.createFactors().cf
+        factors = CorrectionFactors.__new__(CorrectionFactors)
+        factors.configPath = self.configPath
+        factors.buildTable = lambda factorsDict: self.fail('Factor table rebuilt')
+        factors.fRange = self.fRange
+        pd.testing.assert_frame_equal(factors.cf, built, check_dtype=False)
+
+    def test_cache_rebuilt_on_change(self):
+        factors = self.createFactors()
+        cable = self.configPath / 'cable.csv'
+        cable.write_text(cable.read_text().replace(',1.0', ',3.0', 1))
+        changed = self.createFactors()
+        self.assertEqual(changed.cf['cable'].iloc[0], 3.0)
@@ -0,0 +1,62 @@
+import unittest, tempfile, json, pickle
+from pathlib import Path
+
+import drivers, simulator
+from instrumentation import CommandStats, commandHeader, latencyBin
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            profiles={'GPIB': simulator.BusProfile(latency=0.001)}))
+
+    def tearDown(self):
+        drivers.setBackend(None)
+        drivers.setCommandStats(None)
+
+    def test_header(self):
+        self.assertEqual(commandHeader('TRAC:DATA? TRACE1'), 'TRAC:DATA?')
+        self.assertEqual(commandHeader(':SWE:POIN 30000;:BAND 1MHz'), 'SWE:POIN;...')
+        self.assertEqual(commandHeader('1ACP?\n'), '1ACP?')
+        self.assertEqual(commandHeader(b'*OPC?'), '*OPC?')
+
+    def test_latency_bins(self):
+        self.assertEqual(latencyBin(0), 0)
+        self.assertLess(latencyBin(0.001), latencyBin(0.01))
+        self.assertEqual(latencyBin(1e6), latencyBin(1e7))
+
+    def test_log_instrument(self):
+        esw = drivers.ESW(log=True)
+        esw.establishConnection()
+        esw.setSweepPoints(2000)
+        for i in range(3):
+            esw.readTrace(1)
+        rows = {(row['operation'], row['command']): row for row in esw.getCommandStats().summary()}
+        binary = rows[('binary', 'TRAC:DATA?')]
+        self.assertEqual(binary['calls'], 3)
+        self.assertGreaterEqual(binary['bytes'], 3 * 2000 * 4)
+        self.assertGreaterEqual(binary['min_s'], 0.001)
+        self.assertLessEqual(binary['p50_s'], binary['max_s'])
+        self.assertIn('TRAC:DATA?', esw.getCommandStats().format())
+
+    def test_module_stats_and_dump(self):
+        stats = CommandStats()
+        drivers.setCommandStats(stats)
+        ctrl = drivers.EMCenter(connectionId=7)
+        ctrl.establishConnection()
+        ctrl.getCurrentPosition(ctrl.tower)
+        esw = drivers.ESW()
+        self.assertIs(esw.getCommandStats(), stats)
+        resources = {row['resource'] for row in stats.summary()}
+        self.assertEqual(resources, {'GPIB::7::INSTR'})
+        path = Path(tempfile.mkdtemp()) / 'stats.json'
+        stats.dump(path)
+        dump = json.loads(path.read_text())
+        self.assertEqual(dump['summary'][0]['command'], '1ACP?')
+        self.assertEqual(sum(dump['histograms'][0]['latency']), 1)
+
+    def test_pickle(self):
+        stats = CommandStats()
+        stats.record('GPIB::20::INSTR', 'query', '*IDN?', 0.01, 40)
+        copy = pickle.loads(pickle.dumps(stats))
+        self.assertEqual(copy.summary()[0]['calls'], 1)
+        copy.record('GPIB::20::INSTR', 'query', '*IDN?', 0.01, 40)
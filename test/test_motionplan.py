@@ -0,0 +1,122 @@
+import unittest, time
+
+import numpy as np
+
+import drivers, simulator
+from motionplan import MotionPlanner, Step, currentState, runPlan
+
+def visits(start, plan):
+    ''' Returns [(polarity, tower from, tower to, turntable from, turntable to)]
+        for every step of plan
+    '''
+    state = dict(start)
+    legs = []
+    for step in plan.steps:
+        polarity = step.polarity or state['polarity']
+        tower = step.tower if step.tower is not None else state['tower']
+        turntable = step.turntable if step.turntable is not None else state['turntable']
+        legs.append((polarity, state['tower'], tower, state['turntable'], turntable))
+        state.update(tower=tower, turntable=turntable, polarity=polarity)
+    return legs
+
+class TestMotionPlanner(unittest.TestCase):
+    def setUp(self):
+        self.planner = MotionPlanner(polarityTime=5)
+        self.start = {'tower': 100.0, 'turntable': 0.0, 'polarity': 'V'}
+
+    def assertCovered(self, plan, polarities, low, high, azimuths):
+        for polarity in polarities:
+            legs = [leg for leg in visits(self.start, plan) if leg[0] == polarity]
+            self.assertTrue(any({leg[1], leg[2]} == {low, high} for leg in legs))
+            for azimuth in azimuths:
+                self.assertTrue(any(min(leg[3:]) <= azimuth <= max(leg[3:]) for leg in legs))
+
+    def test_single_polarity(self):
+        plan = self.planner.plan(self.start, heights=(100, 400), polarities='V')
+        self.assertEqual(plan.steps, [Step(tower=400)])
+        self.assertAlmostEqual(plan.duration, 300 / 15 + 1)
+
+    def test_return_tower(self):
+        plan = self.planner.plan(self.start, heights=(100, 400), polarities='V', returnTower=100)
+        self.assertEqual(plan.steps, [Step(tower=400), Step(tower=100)])
+        # The second polarity already sweeps back down
+        plan = self.planner.plan(self.start, heights=(100, 400), polarities='VH', returnTower=100)
+        self.assertEqual(plan.steps, [Step(tower=400), Step(polarity='H'), Step(tower=100)])
+
+    def test_current_polarity_first(self):
+        plan = self.planner.plan(self.start, heights=(100, 400), polarities='HV')
+        self.assertEqual(plan.steps, [Step(tower=400), Step(polarity='H'), Step(tower=100)])
+        self.assertCovered(plan, 'VH', 100, 400, [])
+
+    def test_turntable_overlaps_tower(self):
+        azimuths = [0, 90, 180]
+        plan = self.planner.plan(self.start, heights=(100, 400), azimuths=azimuths)
+        self.assertCovered(plan, 'VH', 100, 400, azimuths)
+        # Turntable turns during the tower legs and the polarity switch
+        sequential = 2 * (300 / 15 + 1) + 2 * (180 / 4.5 + 1) + 5
+        self.assertLess(plan.duration, sequential - 40)
+        self.assertEqual(plan.duration, sum(plan.times))
+
+    def test_grid(self):
+        azimuths = [0, 120, 240]
+        plan = self.planner.plan(self.start, heights=(100, 300), azimuths=azimuths, grid=True)
+        for polarity in 'VH':
+            for azimuth in azimuths:
+                # A full tower leg with the turntable standing at the azimuth
+                self.assertIn((polarity, azimuth), [(leg[0], leg[3]) for leg in visits(self.start, plan)
+                    if {leg[1], leg[2]} == {100, 300} and leg[3] == leg[4]])
+        # One polarity switch, at the last azimuth
+        self.assertEqual(sum(step.polarity is not None for step in plan.steps), 1)
+
+    def test_no_polarity(self):
+        with self.assertRaises(ValueError):
+            self.planner.plan(self.start, heights=(100, 400), polarities='')
+
+
+class TestRunPlan(unittest.TestCase):
+    def setUp(self):
+        start = time.monotonic()
+        # Motion runs 50 times faster than real time
+        fastClock = lambda: start + (time.monotonic() - start) * 50
+        self.device = simulator.SimulatedEMCenter(clock=fastClock)
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            devices={'GPIB::7::INSTR': self.device}))
+        self.ctrl = drivers.EMCenter(connectionType='GPIB', connectionId=7)
+        self.ctrl.establishConnection()
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def test_run_plan(self):
+        self.ctrl.setSpeed(self.ctrl.tower, 8)
+        self.ctrl.setSpeed(self.ctrl.turntable, 8)
+        planner = MotionPlanner.fromController(self.ctrl)
+        self.assertEqual(planner.towerVelocity, 40)
+        start = currentState(self.ctrl)
+        self.assertEqual(start, {'tower': 100, 'turntable': 0, 'polarity': 'V'})
+        plan = planner.plan(start, heights=(100, 300), azimuths=(0, 90))
+        positions = []
+        runPlan(self.ctrl, plan, lambda device, position: positions.append((device, position)))
+        state = visits(start, plan)[-1]
+        self.assertEqual(currentState(self.ctrl), {'tower': state[2], 'turntable': state[4], 'polarity': 'H'})
+        self.assertIn(('B', 90), positions)
+        self.assertIn(('A', 300), positions)
+
+    def test_sweep_antenna(self):
+        from types import SimpleNamespace
+        from ccModel import ConfidenceCheck
+        cc = ConfidenceCheck.__new__(ConfidenceCheck)
+        cc.instruments = SimpleNamespace(ctrl=self.ctrl)
+        cc.positions = {'tower': np.nan, 'turntable': np.nan}
+        plan = cc.sweepAntenna(300, polarities='VH', azimuths=(0, 45))
+        self.assertEqual(sum(step.polarity is not None for step in plan.steps), 1)
+        self.assertEqual(self.ctrl.getAntennaPolarity(), 'H')
+        self.assertEqual(cc.positions['turntable'], 0)
+        self.assertEqual(cc.positions['tower'], 100)
+        # One polarity goes up to the maximum and back down
+        plan = cc.sweepAntenna(300, polarities='H')
+        self.assertEqual([step.tower for step in plan.steps], [300, 100])
+        self.assertEqual(cc.positions['tower'], 100)
+
+if __name__ == '__main__':
+    unittest.main()
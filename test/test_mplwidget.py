@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from mplwidget import MplWidget, minMaxDecimate
+
+app = QApplication.instance() or QApplication([])
+
+class TestDecimate(unittest.TestCase):
+    def setUp(self):
+        self.x = np.linspace(30, 1000, 30000)
+        self.y = np.random.default_rng(0).normal(size=30000)
+        self.y[12345] = 60
+
+    def test_short_trace_unchanged(self):
+        index = minMaxDecimate(self.x[:100], self.y[:100], 800)
+        np.testing.assert_array_equal(index, np.arange(100))
+
+    def test_keeps_extremes(self):
+        index = minMaxDecimate(self.x, self.y, 500)
+        self.assertLessEqual(len(index), 4 * 500)
+        self.assertTrue((np.diff(index) > 0).all())
+        self.assertIn(12345, index)
+        self.assertIn(self.y.argmin(), index)
+        self.assertEqual(index[0], 0)
+        self.assertEqual(index[-1], 29999)
+
+    def test_zoomed_range(self):
+        lower, upper = self.x[12000], self.x[13000]
+        index = minMaxDecimate(self.x, self.y, 200, lower, upper)
+        self.assertIn(12345, index)
+        self.assertEqual(index[0], 11999)
+        self.assertEqual(index[-1], 13001)
+
+    def test_nan_bins_kept(self):
+        self.y[:5000] = np.nan
+        index = minMaxDecimate(self.x, self.y, 500)
+        self.assertTrue(np.isnan(self.y[index]).any())
+        self.assertIn(12345, index)
+
+class TestMplWidget(unittest.TestCase):
+    def test_zoom_redecimates(self):
+        widget = MplWidget(None)
+        x = np.linspace(30, 1000, 30000)
+        y = np.zeros(30000)
+        y[20000] = 50
+        line = widget.graph(x, y, 'trace')
+        self.assertLess(len(line.get_xdata()), 30000)
+        widget.mplPlot.set_xlim(x[19990], x[20010])
+        xdata = line.get_xdata()
+        self.assertEqual(len(xdata), 23)
+        self.assertIn(50, line.get_ydata())
+        np.testing.assert_array_equal(widget.traces[line][0], x)
+
+    def test_update_trace_blits(self):
+        widget = MplWidget(None)
+        draws = []
+        widget.canvas.mpl_connect('draw_event', draws.append)
+        x = np.linspace(30, 1000, 30000)
+        line = widget.graph(x, np.zeros(30000), 'trace')
+        widget.updateTrace(line, np.ones(30000) * 0.01)
+        self.assertEqual(len(draws), 1)
+        for i in range(5):
+            widget.updateTrace(line, np.full(30000, 0.01 * i))
+        self.assertEqual(len(draws), 1)
+        np.testing.assert_array_equal(widget.traces[line][1], 0.04)
+        # Leaving the y range rescales and draws everything once
+        widget.updateTrace(line, np.full(30000, 100.0))
+        self.assertEqual(len(draws), 2)
+        self.assertGreaterEqual(widget.mplPlot.get_ylim()[1], 100)
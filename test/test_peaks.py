@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from peaks import findWindowPeaks
+
+class TestPeaks(unittest.TestCase):
+    def setUp(self):
+        self.frequency = np.linspace(30, 1000, 30000)
+        self.amplitude = np.zeros(30000)
+        # Peaks slightly off the golden frequencies
+        for freq, level in ((100.1, 50), (200, 40), (500.3, 30)):
+            self.amplitude[np.abs(self.frequency - freq).argmin()] = level
+
+    def test_nearest_bin(self):
+        index = findWindowPeaks(self.frequency, self.amplitude, [100, 200, 500])
+        self.assertEqual(list(self.amplitude[index]), [0, 40, 0])
+        nearest = [np.abs(self.frequency - f).argmin() for f in (100, 200, 500)]
+        self.assertEqual(list(index), nearest)
+
+    def test_window(self):
+        index = findWindowPeaks(self.frequency, self.amplitude, [100, 200, 500], 0.5)
+        self.assertEqual(list(self.amplitude[index]), [50, 40, 30])
+        self.assertAlmostEqual(self.frequency[index[0]], 100.1, places=1)
+
+    def test_ce_window(self):
+        from ccModel import ConfidenceCheck
+        self.assertEqual(set(ConfidenceCheck.peakWindow), set(ConfidenceCheck.fRanges))
+        # 100 kHz comb falling off with frequency, golden at its harmonics
+        frequency = np.linspace(0.15, 30, 30000)
+        amplitude = np.zeros(30000)
+        for harmonic in (0.2, 0.3, 0.4):
+            amplitude[np.abs(frequency - harmonic).argmin()] = 60 - 10 * harmonic
+        index = findWindowPeaks(frequency, amplitude, [0.3], ConfidenceCheck.peakWindow['L'])
+        self.assertAlmostEqual(frequency[index[0]], 0.3, places=3)
+        index = findWindowPeaks(frequency, amplitude, [0.3], ConfidenceCheck.peakWindow['lf'])
+        self.assertAlmostEqual(frequency[index[0]], 0.2, places=3)
+
+    def test_ignores_nan(self):
+        self.amplitude[:100] = np.nan
+        self.amplitude[50] = np.nan
+        index = findWindowPeaks(self.frequency, self.amplitude, [30.05, 34], 0.1)
+        self.assertTrue(np.isnan(self.amplitude[index[0]]))
+        self.assertAlmostEqual(self.frequency[index[1]], 34, delta=0.1)
+
+    def test_targets_outside_trace(self):
+        index = findWindowPeaks(self.frequency, self.amplitude, [10, 2000], 0.5)
+        self.assertEqual(list(index), [0, 29999])
+
+    def test_no_targets(self):
+        self.assertEqual(findWindowPeaks(self.frequency, self.amplitude, []).size, 0)
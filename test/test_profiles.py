@@ -0,0 +1,97 @@
+import unittest, tempfile, shutil, shelve
+from pathlib import Path
+
+import drivers, profiles, simulator
+
+class TestProfiles(unittest.TestCase):
+    def setUp(self):
+        self.device = simulator.SimulatedESW(seed=0)
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            devices={'GPIB::20::INSTR': self.device},
+            profiles={'GPIB': simulator.BusProfile()}))
+        self.sa = drivers.ESW(connectionType='GPIB', connectionId=20)
+        self.sa.establishConnection()
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def test_apply_from_preset(self):
+        changed = profiles.RE_LF.apply(self.sa)
+        self.assertIn('SENS:FREQ:STAR', changed)
+        self.assertEqual(self.device.frequency['STAR'], 30e6)
+        self.assertEqual(self.device.sweepPoints, 30000)
+        self.assertEqual(self.device.traceModes[1], 'MAXH')
+
+    def test_reapply_sends_nothing(self):
+        profiles.RE_LF.apply(self.sa)
+        self.assertEqual(profiles.RE_LF.apply(self.sa), [])
+
+    def test_reapply_after_reconnect(self):
+        profiles.RE_LF.apply(self.sa)
+        # The pooled session stayed open, the mirror is kept
+        self.sa.establishConnection()
+        self.assertEqual(profiles.RE_LF.apply(self.sa), [])
+        # Changed on the front panel while disconnected
+        self.sa.disconnect()
+        self.device.detectors[1] = 'QPE'
+        self.sa.establishConnection()
+        self.assertEqual(len(profiles.RE_LF.apply(self.sa)), 7)
+        self.assertEqual(self.device.detectors[1], 'POS')
+        self.assertEqual(profiles.RE_LF.apply(self.sa), [])
+
+    def test_switch_range(self):
+        profiles.RE_MF.apply(self.sa)
+        changed = profiles.RE_HF.apply(self.sa)
+        self.assertEqual(changed, ['SENS:FREQ:STAR', 'SENS:FREQ:STOP'])
+        self.assertEqual(self.device.frequency['STOP'], 40e9)
+
+    def test_ce_input(self):
+        profiles.RE_LF.apply(self.sa)
+        profiles.CE.apply(self.sa)
+        self.assertEqual(self.device.inputChannel, 2)
+        profiles.RE_LF.apply(self.sa)
+        self.assertEqual(self.device.inputChannel, 1)
+
+    def test_force(self):
+        profiles.RE_LF.apply(self.sa)
+        self.assertEqual(len(profiles.RE_LF.apply(self.sa, force=True)), 7)
+
+
+class TestConfidenceCheckSettings(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.device = simulator.SimulatedESW(seed=0)
+        drivers.setBackend(simulator.SimulatedResourceManager(
+            devices={'GPIB::20::INSTR': self.device},
+            profiles={'GPIB': simulator.BusProfile()}))
+        for fRange in 'LN':
+            with shelve.open(str(self.directory / f'{fRange}Instruments')) as settings:
+                settings['sa'] = drivers.ESW(connectionId=20)
+                settings['ctrl'] = drivers.EMCenter(connectionId=7)
+
+    def tearDown(self):
+        drivers.setBackend(None)
+        shutil.rmtree(self.directory)
+
+    def messages(self, cc, session):
+        ''' Commands written while initializing the analyzer, queries left out '''
+        write = session.write
+        sent = []
+        session.write = lambda message: sent.extend(message.split(';')) or write(message)
+        try:
+            cc.initAnalyzer()
+        finally:
+            session.write = write
+        return [message.lstrip(':') for message in sent if not message.startswith('*')]
+
+    def test_only_differences_sent(self):
+        from ccModel import ConfidenceCheck
+        cc = ConfidenceCheck(fRange='L', filepath=self.directory / 'results.db', configPath=self.directory)
+        cc.initAnalyzer()
+        session = cc.instruments.sa.resource.resource
+        traceModes = [f'DISP:TRAC{trace}:MODE {mode}' for trace, mode in profiles.CE.traceModes.items()]
+        self.assertEqual(self.messages(cc, session), traceModes)
+        # Every range recalls its own Instruments
+        cc.fRange = 'N'
+        self.assertEqual(self.messages(cc, session), traceModes)
+        cc.results.close()
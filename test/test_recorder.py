@@ -0,0 +1,80 @@
+import unittest, tempfile, shutil, os
+from pathlib import Path
+
+import numpy as np
+
+from recorder import RecordedSession, SessionRecorder, pruneSessions
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.frequency = np.linspace(30, 1000, 500)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, frames, capacity=2):
+        recorder = SessionRecorder(self.directory / 'session', self.frequency,
+            capacity=capacity, fRange='lf')
+        for i in range(frames):
+            recorder.record(np.full(500, i), np.full(500, -i),
+                tower=100 + i, turntable=0, timestamp=recorder.start + i / 10)
+        recorder.close()
+        return recorder
+
+    def test_round_trip(self):
+        recorder = self.record(5)
+        # Doubles while smaller than growFrames
+        self.assertEqual(recorder.capacity, 8)
+        session = RecordedSession(self.directory / 'session')
+        self.assertEqual(len(session), 5)
+        self.assertEqual(session.info['fRange'], 'lf')
+        np.testing.assert_array_equal(session.frequency, self.frequency)
+        np.testing.assert_allclose(session.time, np.arange(5) / 10, atol=1e-6)
+        np.testing.assert_array_equal(session.tower, [100, 101, 102, 103, 104])
+        np.testing.assert_array_equal(session.trace(3, 1), 3)
+        np.testing.assert_array_equal(session.trace(3, 2), -3)
+
+    def test_unused_rows_trimmed(self):
+        recorder = self.record(3, capacity=100)
+        size = (self.directory / 'session.f32').stat().st_size
+        self.assertEqual(size, 3 * recorder.width * 4)
+
+    def sessions(self, frames):
+        ''' Records a session of frames[i] frames for every i, oldest first.
+            Returns the bytes each session takes on disk.
+        '''
+        sizes = []
+        for i, count in enumerate(frames):
+            recorder = SessionRecorder(self.directory / f'session{i}', self.frequency, capacity=1)
+            for frame in range(count):
+                recorder.record(np.zeros(500), np.zeros(500))
+            recorder.close()
+            os.utime(recorder.infoPath, (i, i))
+            sizes.append(recorder.path.stat().st_size + recorder.infoPath.stat().st_size)
+        return sizes
+
+    def test_prune_sessions(self):
+        sizes = self.sessions([1, 1, 1, 1])
+        removed = pruneSessions(self.directory, keep=3)
+        self.assertEqual([p.stem for p in removed], ['session0'])
+        removed = pruneSessions(self.directory, maxBytes=sizes[3] + sizes[2])
+        self.assertEqual([p.stem for p in removed], ['session1'])
+        self.assertEqual(sorted(p.name for p in self.directory.iterdir()),
+            ['session2.f32', 'session2.json', 'session3.f32', 'session3.json'])
+
+    def test_prune_older_than_budget(self):
+        sizes = self.sessions([1, 8, 1])
+        # session0 would fit on its own but is older than session1
+        removed = pruneSessions(self.directory, maxBytes=sizes[2] + sizes[0])
+        self.assertEqual([p.stem for p in removed], ['session1', 'session0'])
+
+    def test_empty_session(self):
+        self.record(0)
+        self.assertEqual(len(RecordedSession(self.directory / 'session')), 0)
+
+    def test_trace_count(self):
+        recorder = SessionRecorder(self.directory / 'session', self.frequency)
+        with self.assertRaises(ValueError):
+            recorder.record(np.zeros(500))
+        recorder.close()
@@ -0,0 +1,71 @@
+import unittest, tempfile, shutil, shelve
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import constants, drivers
+from recorder import RecordedSession, SessionRecorder
+from replay import ReplayAnalyzer, replaySession
+from results import SqliteResults
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.frequency = np.linspace(30, 1000, 200)
+        recorder = SessionRecorder(self.directory / 'session', self.frequency)
+        for i in range(3):
+            recorder.record(np.full(200, i), np.full(200, 10 + i))
+        recorder.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_frames(self):
+        analyzer = ReplayAnalyzer(self.directory / 'session')
+        trace = analyzer.readTrace(1)
+        np.testing.assert_array_equal(trace[constants.XCOL], self.frequency)
+        self.assertTrue((trace[constants.YCOL] == 0).all())
+        analyzer.waitSweep()
+        analyzer.waitSweep()
+        self.assertTrue((analyzer.readTrace(2)[constants.YCOL] == 12).all())
+        with self.assertRaises(EOFError):
+            analyzer.waitSweep()
+
+    def test_loop(self):
+        analyzer = ReplayAnalyzer(RecordedSession(self.directory / 'session'), loop=True)
+        for i in range(3):
+            analyzer.waitSweep()
+        self.assertEqual(analyzer.frame, 0)
+
+    def test_empty_session(self):
+        SessionRecorder(self.directory / 'empty', self.frequency).close()
+        with self.assertRaises(ValueError):
+            ReplayAnalyzer(self.directory / 'empty')
+
+    def test_replay_session(self):
+        from ccModel import ConfidenceCheck
+        frequency = np.linspace(0.15, 30, 3000)
+        pd.DataFrame({0: frequency, 1: np.zeros(3000)}).to_csv(self.directory / 'lisn.csv', header=False, index=False)
+        with shelve.open(str(self.directory / 'LFactors')) as factors:
+            factors['LISN'] = self.directory / 'lisn.csv'
+        with shelve.open(str(self.directory / 'LInstruments')) as settings:
+            settings['sa'] = drivers.ESW()
+            settings['ctrl'] = drivers.EMCenter()
+        results = SqliteResults(self.directory / 'results.db')
+        results.setGoldenValues('L', [10, 20], [60, 57])
+        results.close()
+        recorder = SessionRecorder(self.directory / 'ce', frequency, fRange='L')
+        trace = np.zeros(3000)
+        # Max hold builds up the comb, only the last frame reaches the golden levels
+        for level in (20, 40, 59):
+            trace[[np.abs(frequency - 10).argmin(), np.abs(frequency - 20).argmin()]] = [level, level - 2]
+            recorder.record(trace, trace)
+        recorder.close()
+        cc = ConfidenceCheck('L', self.directory / 'results.db', configPath=self.directory)
+        live = cc.instruments.sa
+        frame, passed = replaySession(cc, self.directory / 'ce')
+        self.assertTrue(passed)
+        np.testing.assert_allclose(frame['Delta'], [-1, 0], atol=1e-4)
+        self.assertIs(cc.instruments.sa, live)
+        cc.results.close()
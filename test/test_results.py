@@ -0,0 +1,78 @@
+import unittest, tempfile, shutil
+from pathlib import Path
+
+import numpy as np
+
+import results
+
+class TestResults(unittest.TestCase):
+    fRange = 'lf'
+    frequencies = np.array([30.0, 100.0, 300.0])
+    golden = np.array([40.0, 45.5, 50.0])
+    measured = np.array([41.0, 44.5, 50.0])
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self, store):
+        store.setGoldenValues(self.fRange, self.frequencies, self.golden)
+        frequencies, golden = store.goldenValues(self.fRange)
+        np.testing.assert_array_equal(frequencies, self.frequencies)
+        np.testing.assert_array_equal(golden, self.golden)
+        with self.assertRaises(results.GoldenValuesMissing):
+            store.goldenValues('mf')
+
+        for i in range(2):
+            store.saveResults(self.fRange, 'user', self.frequencies, self.golden,
+                self.measured, self.measured - self.golden)
+        saved = store.getResults(self.fRange)
+        self.assertEqual(len(saved), 6)
+        self.assertEqual(list(saved['delta'][:3]), [1.0, -1.0, 0.0])
+
+        store.clearResults(self.fRange)
+        self.assertEqual(len(store.getResults(self.fRange)), 3)
+        store.close()
+
+    def test_sqlite(self):
+        store = results.openResults(self.directory / 'results.db')
+        self.assertIsInstance(store, results.SqliteResults)
+        self.check(store)
+
+    def test_csv(self):
+        store = results.openResults(self.directory / 'results')
+        self.assertIsInstance(store, results.CsvResults)
+        self.check(store)
+
+    def test_copy_golden_values(self):
+        source = results.openResults(self.directory / 'results.db')
+        source.setGoldenValues(self.fRange, self.frequencies, self.golden)
+        target = results.openResults(self.directory / 'csv')
+        self.assertEqual(results.copyGoldenValues(source, target, ['lf', 'mf']), ['lf'])
+        np.testing.assert_array_equal(target.goldenValues(self.fRange)[1], self.golden)
+        source.close()
+
+    def test_copy_to_excel_refused(self):
+        source = results.openResults(self.directory / 'results.db')
+        source.setGoldenValues(self.fRange, self.frequencies, self.golden)
+        # Never opened, xlwings may be missing
+        target = results.ExcelResults.__new__(results.ExcelResults)
+        with self.assertRaises(ValueError):
+            results.copyGoldenValues(source, target, [self.fRange])
+        source.close()
+
+    def test_abstract_store(self):
+        with self.assertRaises(TypeError):
+            results.ResultsStore(self.directory / 'results.db')
+
+    def test_can_create(self):
+        self.assertTrue(results.canCreate(self.directory / 'new.db'))
+        self.assertTrue(results.canCreate(self.directory / 'csv'))
+        self.assertFalse(results.canCreate(self.directory / 'missing' / 'new.db'))
+        self.assertFalse(results.canCreate(self.directory / 'new.xlsx'))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            results.openResults(self.directory / 'results.txt')
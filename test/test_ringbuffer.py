@@ -0,0 +1,52 @@
+import unittest, threading
+
+import numpy as np
+
+from ringbuffer import FrameRing
+
+class TestFrameRing(unittest.TestCase):
+    frequency = np.linspace(30, 1000, 100)
+
+    def test_empty(self):
+        self.assertEqual(FrameRing().latest(), (0, None, None))
+
+    def test_latest_frame(self):
+        ring = FrameRing(size=3)
+        for i in range(5):
+            ring.push(self.frequency, np.full(100, i), np.full(100, -i))
+        count, frequency, traces = ring.latest()
+        self.assertEqual(count, 5)
+        np.testing.assert_array_equal(frequency, self.frequency)
+        self.assertEqual(traces.shape, (2, 100))
+        self.assertTrue((traces[0] == 4).all())
+        self.assertTrue((traces[1] == -4).all())
+
+    def test_latest_is_a_copy(self):
+        ring = FrameRing(size=2)
+        ring.push(self.frequency, np.zeros(100), np.zeros(100))
+        count, frequency, traces = ring.latest()
+        ring.push(self.frequency, np.ones(100), np.ones(100))
+        ring.push(self.frequency, np.ones(100), np.ones(100))
+        self.assertTrue((traces == 0).all())
+
+    def test_points_change(self):
+        ring = FrameRing()
+        ring.push(self.frequency, np.zeros(100), np.zeros(100))
+        ring.push(self.frequency[:50], np.ones(50), np.ones(50))
+        count, frequency, traces = ring.latest()
+        self.assertEqual(count, 1)
+        self.assertEqual(traces.shape, (2, 50))
+
+    def test_concurrent_push(self):
+        ring = FrameRing()
+        def writer():
+            for i in range(200):
+                ring.push(self.frequency, np.full(100, i), np.full(100, i))
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while thread.is_alive():
+            count, frequency, traces = ring.latest()
+            if count:
+                self.assertTrue((traces == traces[0, 0]).all())
+        thread.join()
+        self.assertEqual(ring.latest()[0], 200)
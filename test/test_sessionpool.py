@@ -0,0 +1,66 @@
+import unittest, pickle
+
+import visa
+
+import drivers, simulator
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.rm = simulator.SimulatedResourceManager(profiles={'GPIB': simulator.BusProfile()})
+        drivers.setBackend(self.rm)
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def test_shared_handle(self):
+        esw = drivers.ESW()
+        esw.establishConnection()
+        other = drivers.ESW()
+        other.establishConnection()
+        self.assertIs(esw.resource, other.resource)
+        session = esw.resource.resource
+        esw.close()
+        esw.establishConnection()
+        self.assertIs(esw.resource.resource, session)
+        self.assertIn('ESW', str(esw))
+
+    def test_reconnect_stale_session(self):
+        esw = drivers.ESW()
+        esw.establishConnection()
+        esw.resource.resource.close()
+        self.assertIn('ESW', esw.query('*IDN?'))
+        self.assertEqual(esw.resource.reconnects, 1)
+        self.assertEqual(esw.resource.timeout, 35000)
+
+    def test_reconnect_lost_connection(self):
+        esw = drivers.ESW()
+        esw.establishConnection()
+        session = esw.resource.resource
+        def lost(message):
+            raise visa.VisaIOError(visa.constants.StatusCode.error_connection_lost)
+        session.write = lost
+        esw.write('SWE:POIN 1000')
+        self.assertIsNot(esw.resource.resource, session)
+        self.assertEqual(esw.getSweepPoints(), 1000)
+
+    def test_timeout_not_retried(self):
+        esw = drivers.ESW()
+        esw.establishConnection()
+        with self.assertRaises(visa.VisaIOError):
+            esw.resource.read()
+        self.assertEqual(esw.resource.reconnects, 0)
+
+    def test_backend_change_closes(self):
+        esw = drivers.ESW()
+        esw.establishConnection()
+        session = esw.resource.resource
+        drivers.setBackend(self.rm)
+        self.assertFalse(session.session)
+        self.assertEqual(drivers.pool.handles, {})
+
+    def test_pickle_without_session(self):
+        esw = drivers.ESW(connectionId=20)
+        esw.establishConnection()
+        copy = pickle.loads(pickle.dumps(esw))
+        self.assertNotIn('resource', copy.__dict__)
+        self.assertEqual(copy.connectionId, 20)
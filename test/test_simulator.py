@@ -0,0 +1,207 @@
+import unittest, time
+
+import numpy as np
+import visa
+
+import drivers, simulator
+
+class TestSimulator(unittest.TestCase):
+    profiles = {
+        'GPIB': simulator.BusProfile(),
+        'TCPIP': simulator.BusProfile(),
+    }
+
+    def setUp(self):
+        self.rm = simulator.SimulatedResourceManager(devices={
+            'GPIB::20::INSTR': simulator.SimulatedESW(seed=0),
+            'TCPIP::10.0.0.10::INSTR': simulator.SimulatedESW(seed=0),
+            'GPIB::7::INSTR': simulator.SimulatedEMCenter(),
+        }, profiles=self.profiles)
+        drivers.setBackend(self.rm)
+
+    def tearDown(self):
+        drivers.setBackend(None)
+
+    def createEsw(self, connectionType='GPIB', connectionId=20):
+        esw = drivers.ESW(connectionType=connectionType, connectionId=connectionId)
+        esw.establishConnection()
+        esw.setSweepPoints(3000)
+        esw.setFrequencyStart(30, 'MHz')
+        esw.setFrequencyStop(1, 'GHz')
+        esw.setRbw(120, 'kHz')
+        return esw
+
+    def test_idn(self):
+        esw = self.createEsw()
+        self.assertIn('ESW', str(esw))
+
+    def test_frequency_settings(self):
+        esw = self.createEsw()
+        self.assertEqual(esw.getFrequencyStart(), 30)
+        self.assertEqual(esw.getFrequencyStop(), 1000)
+        self.assertEqual(int(esw.getSweepPoints()), 3000)
+
+    def test_sweep_count(self):
+        esw = self.createEsw()
+        self.assertTrue(esw.setSweepCount(5))
+        self.assertEqual(esw.getSweepCount(), 5)
+
+    def test_read_trace_gpib(self):
+        esw = self.createEsw()
+        trace = esw.readTrace(1)
+        self.assertEqual(len(trace), 3000)
+        self.assertAlmostEqual(trace['Frequency (MHz)'].iloc[-1], 1000)
+
+    def test_read_trace_ascii(self):
+        esw = self.createEsw()
+        esw.binaryTransfer = False
+        trace = esw.readTrace(1)
+        self.assertEqual(len(trace), 3000)
+        self.assertEqual(trace['Amplitude (dBuV/m)'].dtype, float)
+
+    def test_read_trace_data(self):
+        esw = self.createEsw()
+        data = esw.readTraceData(1, 3000)
+        self.assertEqual(data.dtype, np.float32)
+        self.assertEqual(data.size, 3000)
+
+    def test_read_trace_tcpip(self):
+        esw = self.createEsw('TCPIP', '10.0.0.10')
+        trace = esw.readTrace(1)
+        self.assertEqual(len(trace), 3000)
+
+    def test_comb_peaks(self):
+        esw = self.createEsw()
+        trace = esw.readTrace(1)
+        peak = trace.iloc[trace['Amplitude (dBuV/m)'].idxmax()]
+        self.assertAlmostEqual(peak['Frequency (MHz)'] % 10, 0, delta=0.5)
+
+    def test_state_mirror(self):
+        esw = self.createEsw()
+        esw.readTrace(1)
+        str(esw)
+        queries = []
+        query = esw.resource.query
+        esw.resource.query = lambda *args, **kwargs: queries.append(args) or query(*args, **kwargs)
+        esw.readTrace(1)
+        str(esw)
+        self.assertEqual(queries, [])
+        self.assertEqual(esw.state['SENS:FREQ:STAR'], 30e6)
+
+    def test_state_invalidated_by_preset(self):
+        esw = self.createEsw()
+        esw.preset()
+        self.assertNotIn('SWE:POIN', esw.state)
+        self.assertEqual(esw.getSweepPoints(), 1001)
+
+    def test_batch(self):
+        esw = self.createEsw()
+        messages = []
+        # Count messages on the simulated session under the pooled handle
+        session = esw.resource.resource
+        write = session.write
+        session.write = lambda message: messages.append(message) or write(message)
+        with esw.batch():
+            esw.preset()
+            esw.setSweepPoints(2000)
+            esw.setFrequencyStart(150, 'kHz')
+            esw.setFrequencyStop(30, 'MHz')
+            esw.setRbw(9, 'kHz')
+            esw.setTraceMode(1, 'MAXH')
+            esw.setDetector(1, 'QPE')
+            esw.rfInput(2)
+            self.assertEqual(messages, [])
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].endswith(';*OPC?'))
+        self.assertEqual(esw.verifySettings(), {})
+        self.assertEqual(esw.getFrequencyStop(), 30)
+        self.assertEqual(len(esw.readTrace(1)), 2000)
+
+    def test_verify_normalizes_readback(self):
+        esw = self.createEsw()
+        esw.setSweepMode(2, 'off')
+        esw.setSweepPoints(2000)
+        self.assertEqual(esw.verifySettings(), {})
+        self.assertFalse(esw.isContinuous())
+        self.assertTrue(drivers.settingMatches('ON', '1'))
+        self.assertTrue(drivers.settingMatches(30e6, '3.0000000E+07'))
+        self.assertTrue(drivers.settingMatches('1', '1.000'))
+        self.assertFalse(drivers.settingMatches('OFF', '1'))
+        self.assertFalse(drivers.settingMatches('MAXH', '0'))
+
+    def test_one_write_per_frame(self):
+        esw = self.createEsw()
+        esw.readTrace(1)
+        messages = []
+        session = esw.resource.resource
+        write = session.write
+        session.write = lambda message: messages.append(message) or write(message)
+        for binary in (True, False):
+            esw.binaryTransfer = binary
+            for i in range(3):
+                esw.readTrace(1)
+        # The format is only sent again when switching to ASCII
+        self.assertEqual(messages, ['TRAC:DATA? TRACE1'] * 3 + ['FORM ASC'] + ['TRAC:DATA? TRACE1'] * 3)
+
+    def test_batch_error_invalidates(self):
+        esw = self.createEsw()
+        esw.setFrequencyStop(30, 'MHz')
+        session = esw.resource.resource
+        def fail(message):
+            raise visa.VisaIOError(visa.constants.StatusCode.error_timeout)
+        session.write = fail
+        with self.assertRaises(visa.VisaIOError):
+            with esw.batch():
+                esw.setFrequencyStop(1, 'GHz')
+        self.assertEqual(esw.state, {})
+        del session.write
+        self.assertEqual(esw.getFrequencyStop(), 30)
+
+    def test_batch_verify_mismatch(self):
+        esw = self.createEsw()
+        with self.assertWarns(UserWarning):
+            with esw.batch(verify=True):
+                esw.setSweepPoints(2000)
+                esw.state['SWE:POIN'] = 1000
+        self.assertEqual(esw.getSweepPoints(), 2000)
+
+    def test_wait_sweep(self):
+        esw = self.createEsw()
+        esw.setRbw(1, 'MHz')
+        sweepTime = esw.getSweepTime()
+        self.assertAlmostEqual(sweepTime, 2.5 * 970e6 / 1e12, places=6)
+        esw.setRbw(100, 'kHz')
+        self.assertNotIn('SWE:TIME', esw.state)
+        sweepTime = esw.getSweepTime()
+        esw.waitSweep()
+        start = time.monotonic()
+        esw.waitSweep()
+        self.assertGreaterEqual(time.monotonic() - start, sweepTime)
+
+    def test_wait_sweep_single(self):
+        esw = self.createEsw()
+        esw.setSweepMode(1, 'off')
+        self.assertFalse(esw.isContinuous())
+        esw.setRbw(100, 'kHz')
+        start = time.monotonic()
+        esw.waitSweep()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_unknown_resource(self):
+        esw = drivers.ESW(connectionType='GPIB', connectionId=3)
+        with self.assertRaises(drivers.visa.VisaIOError):
+            esw.establishConnection()
+
+    def test_tower_motion(self):
+        ctrl = drivers.EMCenter(connectionType='GPIB', connectionId=7)
+        ctrl.establishConnection()
+        ctrl.setSpeed(ctrl.tower, 8)
+        ctrl.setPosition(ctrl.tower, 102)
+        self.assertEqual(ctrl.isOpComplete(ctrl.tower), 0)
+        time.sleep(1.2)
+        self.assertEqual(ctrl.isOpComplete(ctrl.tower), 1)
+        self.assertEqual(float(ctrl.getCurrentPosition(ctrl.tower)), 102)
+
+    def test_bus_profile(self):
+        bus = simulator.BusProfile(latency=0.001, throughput=1000)
+        self.assertAlmostEqual(bus.transferTime(1000), 1.001)